@@ -5,23 +5,70 @@ Demo script showcasing LLM-aided Testbench Generation capabilities.
 This script demonstrates the complete workflow with example modules.
 """
 
+import io
 import sys
 import os
+import argparse
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from src.testbench_pipeline import TestbenchPipeline
+from src.llm_cache import LLMCache
+
+logger = logging.getLogger(__name__)
+
+# Shared by both demos so repeated runs are served from disk
+llm_cache = LLMCache()
+
+# Banner separators
+_SEP_EQ = "=" * 80
+_SEP_DASH = "-" * 80
+_SEP_BLK = "█" * 80
+_SEP_BANG = "!" * 80
+_SEP_CHK = "✓" * 80
+
+# Multi-line banners, each emitted with a single write
+_INTRO = f"""
+{_SEP_BLK}
+{" " * 20}LLM-AIDED TESTBENCH GENERATION DEMO
+{_SEP_BLK}
+
+This demo showcases the 5-step automated testbench generation process:
+  Step 1-2: Accept natural language description and Verilog code
+  Step 3:   Generate testbench with comprehensive test patterns
+  Step 4:   Create Python golden model and compute expected outputs
+  Step 5:   Update testbench with verification logic
+"""
 
+_NO_LLM_NOTE = f"""
+{_SEP_BANG}
+NOTE: Running in DEMO MODE without LLM
+{_SEP_BANG}
 
-def print_section(title):
-    """Print a section header."""
-    print("\n" + "=" * 80)
-    print(title)
-    print("=" * 80 + "\n")
+For full LLM-powered generation, set your API key:
+  export OPENAI_API_KEY='your-api-key-here'
 
+The demo will still show the complete workflow with mock generation.
+"""
 
-def demo_mux():
-    """Demonstrate testbench generation for a 2-to-1 MUX."""
-    print_section("DEMO 1: 2-to-1 Multiplexer")
-    
-    description = """A 2-to-1 multiplexer (MUX).
+_OUTRO = """Generated testbenches are available in:
+  - demo_output/mux/
+  - demo_output/adder/
+
+You can simulate these testbenches using:
+  iverilog -o sim <module.v> <testbench_final.v>
+  vvp sim
+"""
+
+
+# Demo inputs, defined once so repeated runs send byte-identical prompts
+DEMOS = {
+    "mux": ("DEMO 1: 2-to-1 Multiplexer", "demo_output/mux"),
+    "adder": ("DEMO 2: 4-bit Adder", "demo_output/adder"),
+}
+
+DESCRIPTIONS = {
+    "mux": """A 2-to-1 multiplexer (MUX).
 
 The module takes two 1-bit input signals (a and b) and one 1-bit select signal (sel).
 
@@ -34,39 +81,8 @@ Functionality:
 When sel is 0, the output y should be equal to input a.
 When sel is 1, the output y should be equal to input b.
 
-This is a combinational logic circuit with no state or memory."""
-
-    verilog_code = """module mux2to1 (
-    input wire a,
-    input wire b,
-    input wire sel,
-    output wire y
-);
-    assign y = sel ? b : a;
-endmodule"""
-
-    print("Natural Language Description:")
-    print("-" * 80)
-    print(description)
-    print("\n")
-    
-    print("Verilog Code:")
-    print("-" * 80)
-    print(verilog_code)
-    print("\n")
-    
-    # Run pipeline
-    pipeline = TestbenchPipeline()
-    result = pipeline.run(description, verilog_code, "demo_output/mux")
-    
-    return result
-
-
-def demo_adder():
-    """Demonstrate testbench generation for a 4-bit adder."""
-    print_section("DEMO 2: 4-bit Adder")
-    
-    description = """A simple 4-bit adder module.
+This is a combinational logic circuit with no state or memory.""",
+    "adder": """A simple 4-bit adder module.
 
 The module takes two 4-bit input signals (a and b) and produces a 4-bit sum output and a 1-bit carry output.
 
@@ -77,9 +93,19 @@ Functionality:
 - Output 'carry': 1-bit carry-out flag (set to 1 if result exceeds 15)
 
 The adder performs unsigned addition of the two 4-bit inputs.
-If the result is greater than 15 (0xF), the carry output should be set to 1."""
+If the result is greater than 15 (0xF), the carry output should be set to 1.""",
+}
 
-    verilog_code = """module adder4bit (
+VERILOG = {
+    "mux": """module mux2to1 (
+    input wire a,
+    input wire b,
+    input wire sel,
+    output wire y
+);
+    assign y = sel ? b : a;
+endmodule""",
+    "adder": """module adder4bit (
     input wire [3:0] a,
     input wire [3:0] b,
     output wire [3:0] sum,
@@ -89,79 +115,139 @@ If the result is greater than 15 (0xF), the carry output should be set to 1."""
     assign result = a + b;
     assign sum = result[3:0];
     assign carry = result[4];
-endmodule"""
+endmodule""",
+}
+
 
-    print("Natural Language Description:")
-    print("-" * 80)
-    print(description)
-    print("\n")
+def print_section(title):
+    """Print a section header."""
+    sys.stdout.write(f"\n{_SEP_EQ}\n{title}\n{_SEP_EQ}\n\n")
+
+
+def print_demo_done(number):
+    """Print the completion banner of a demo."""
+    sys.stdout.write(f"\n{_SEP_CHK}\nDemo {number} completed successfully!\n{_SEP_CHK}\n")
+
+
+class _ThreadOutput:
+    """Stand-in for sys.stdout that holds back the output of demos run in worker threads."""
     
-    print("Verilog Code:")
-    print("-" * 80)
-    print(verilog_code)
-    print("\n")
+    def __init__(self, stream):
+        self._stream = stream
+        self._buffers = {}
     
-    # Run pipeline
-    pipeline = TestbenchPipeline()
-    result = pipeline.run(description, verilog_code, "demo_output/adder")
+    def write(self, text):
+        buffer = self._buffers.get(threading.get_ident())
+        return (self._stream if buffer is None else buffer).write(text)
     
-    return result
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+    
+    def run(self, demo, pipeline):
+        """Run a demo in the calling thread and return its output instead of printing it."""
+        buffer = self._buffers[threading.get_ident()] = io.StringIO()
+        try:
+            demo(pipeline)
+        except BaseException:
+            # Keep what the demo printed before failing
+            self._stream.write(buffer.getvalue())
+            raise
+        finally:
+            del self._buffers[threading.get_ident()]
+        return buffer.getvalue()
+
+
+def _run_demo(pipeline, name):
+    """Print the inputs of a demo and run the pipeline on them."""
+    title, output_dir = DEMOS[name]
+    print_section(title)
+    
+    sys.stdout.write(
+        f"Natural Language Description:\n{_SEP_DASH}\n{DESCRIPTIONS[name]}\n\n\n"
+        f"Verilog Code:\n{_SEP_DASH}\n{VERILOG[name]}\n\n\n"
+    )
+    
+    # Run pipeline
+    return pipeline.run(DESCRIPTIONS[name], VERILOG[name], output_dir)
+
+
+def demo_mux(pipeline):
+    """Demonstrate testbench generation for a 2-to-1 MUX."""
+    return _run_demo(pipeline, "mux")
+
+
+def demo_adder(pipeline):
+    """Demonstrate testbench generation for a 4-bit adder."""
+    return _run_demo(pipeline, "adder")
 
 
 def main():
     """Run all demos."""
-    print("\n" + "█" * 80)
-    print(" " * 20 + "LLM-AIDED TESTBENCH GENERATION DEMO")
-    print("█" * 80)
+    parser = argparse.ArgumentParser(description='LLM-aided Testbench Generation demo')
+    parser.add_argument('--interactive', '-i',
+                        action='store_true',
+                        help='Run the demos one at a time, pausing between them')
+    parser.add_argument('--debug',
+                        action='store_true',
+                        help='Log full tracebacks on errors')
+    args = parser.parse_args()
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
     
-    print("\nThis demo showcases the 5-step automated testbench generation process:")
-    print("  Step 1-2: Accept natural language description and Verilog code")
-    print("  Step 3:   Generate testbench with comprehensive test patterns")
-    print("  Step 4:   Create Python golden model and compute expected outputs")
-    print("  Step 5:   Update testbench with verification logic")
+    sys.stdout.write(_INTRO)
+    
+    # One pipeline (and LLM connection) shared by both demos
+    from src.golden_runner import warmup
+    warmup()
+    pipeline = TestbenchPipeline(cache=llm_cache)
     
     # Check if LLM is configured
-    from src.llm_client import LLMClient
-    llm = LLMClient()
-    if not llm.is_available():
-        print("\n" + "!" * 80)
-        print("NOTE: Running in DEMO MODE without LLM")
-        print("!" * 80)
-        print("\nFor full LLM-powered generation, set your API key:")
-        print("  export OPENAI_API_KEY='your-api-key-here'")
-        print("\nThe demo will still show the complete workflow with mock generation.")
-        input("\nPress Enter to continue...")
+    if not pipeline.llm_client.is_available():
+        sys.stdout.write(_NO_LLM_NOTE)
+        if args.interactive:
+            input("\nPress Enter to continue...")
     
     # Run demos
     try:
-        demo_mux()
-        print("\n" + "✓" * 80)
-        print("Demo 1 completed successfully!")
-        print("✓" * 80)
-        
-        input("\nPress Enter to run Demo 2...")
-        
-        demo_adder()
-        print("\n" + "✓" * 80)
-        print("Demo 2 completed successfully!")
-        print("✓" * 80)
+        if args.interactive:
+            demo_mux(pipeline)
+            print_demo_done(1)
+            
+            input("\nPress Enter to run Demo 2...")
+            
+            demo_adder(pipeline)
+            print_demo_done(2)
+        elif pipeline.llm_client.is_available():
+            # The demos share no state and mostly wait on the LLM, so overlap them,
+            # printing each demo's output in one piece once it finishes
+            output = sys.stdout = _ThreadOutput(sys.stdout)
+            try:
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    futures = {executor.submit(output.run, demo_mux, pipeline): 1,
+                               executor.submit(output.run, demo_adder, pipeline): 2}
+                    for future in as_completed(futures):
+                        sys.stdout.write(future.result())
+                        print_demo_done(futures[future])
+            finally:
+                sys.stdout = output._stream
+        else:
+            # Without an LLM there is nothing to wait on, so run the demos in order
+            demo_mux(pipeline)
+            print_demo_done(1)
+            demo_adder(pipeline)
+            print_demo_done(2)
         
         print_section("DEMO COMPLETE")
-        print("Generated testbenches are available in:")
-        print("  - demo_output/mux/")
-        print("  - demo_output/adder/")
-        print("\nYou can simulate these testbenches using:")
-        print("  iverilog -o sim <module.v> <testbench_final.v>")
-        print("  vvp sim")
+        sys.stdout.write(_OUTRO)
+        print(f"\nLLM cache: {llm_cache.stats['hits']} hits, {llm_cache.stats['misses']} misses")
         print("\nThank you for trying LLM-aided Testbench Generation!")
         
     except KeyboardInterrupt:
         print("\n\nDemo interrupted by user.")
         sys.exit(0)
     except Exception as e:
-        print(f"\n\nError during demo: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"\n\nError during demo: {e!r}")
+        logger.debug("Demo failed", exc_info=True)
         sys.exit(1)
 
 
@@ -10,10 +10,56 @@ Usage:
 """
 
 import argparse
+import glob
+import logging
 import sys
 import os
+from pathlib import Path
 from src.testbench_pipeline import TestbenchPipeline
-import subprocess
+from src.llm_cache import LLMCache
+from src import simulator
+
+logger = logging.getLogger(__name__)
+
+# Larger inputs would not fit in an LLM request anyway
+MAX_INPUT_BYTES = 1 << 20
+
+
+def read_input(path, what):
+    """Read a description or Verilog file, exiting with an error if it is missing or too large."""
+    try:
+        file = Path(path)
+        if file.stat().st_size > MAX_INPUT_BYTES:
+            print(f"Error: {what} file too large (over {MAX_INPUT_BYTES} bytes): {path}")
+            sys.exit(1)
+        return file.read_text(encoding='utf-8')
+    except FileNotFoundError:
+        print(f"Error: {what} file not found: {path}")
+        sys.exit(1)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Error reading {what.lower()} file: {e}")
+        sys.exit(1)
+
+
+def simulate(verilog_path, output_dir):
+    """Compile and run the final testbench of a module with iverilog."""
+    vvp_path = os.path.join(output_dir, "out.vvp")
+    print("Testbench Compilation......")
+    result = simulator.compile_testbench(
+        [verilog_path, os.path.join(output_dir, "testbench_final.v")], vvp_path
+    )
+    # iverilog reports non-fatal warnings on stderr too, so only the exit code means failure
+    if result.returncode != 0:
+        print(f"Compilation error: {result.stderr or result.stdout}")
+        return
+    if result.stderr:
+        print(f"Compilation warnings:\n{result.stderr}")
+    print("Testbench Simulation......")
+    print("result:")
+    result = simulator.run_simulation(vvp_path, on_line=lambda line: print(line, end="", flush=True))
+    if result.returncode != 0:
+        print(f"Simulation exited with code {result.returncode}")
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -32,6 +78,9 @@ Examples:
   
   # Use specific LLM model
   python main.py --example --model gpt-3.5-turbo
+  
+  # Generate testbenches for several modules (files are paired in sorted order)
+  python main.py --description-glob 'specs/*.txt' --verilog-glob 'rtl/*.v'
         """
     )
     
@@ -41,6 +90,14 @@ Examples:
     parser.add_argument('--verilog', '-v', 
                        default='examples/input/mux2to1.v',
                        help='Path to Verilog module file to be tested')
+    parser.add_argument('--description-glob',
+                       help='Glob of description files for a multi-module run (paired in sorted order)')
+    parser.add_argument('--verilog-glob',
+                       help='Glob of Verilog files for a multi-module run (paired in sorted order)')
+    parser.add_argument('--batch-size',
+                       type=int,
+                       default=4,
+                       help='Modules per testbench generation request in multi-module runs (default: 4)')
     parser.add_argument('--output', '-o', 
                        default='examples/output',
                        help='Output directory for generated files (default: examples/output)')
@@ -54,14 +111,63 @@ Examples:
     parser.add_argument('--api-key',
                        default=os.environ.get('TbGeneration'),
                        help='API key for LLM provider (overrides OPENAI_API_KEY env var)')
+    parser.add_argument('--combine-steps',
+                       action='store_true',
+                       help='Generate the testbench and golden model in a single LLM request')
+    parser.add_argument('--rtl-golden',
+                       action='store_true',
+                       help='Derive the golden model from assign-only Verilog instead of the LLM '
+                            '(the model then mirrors the RTL, not the description)')
+    parser.add_argument('--batch-api',
+                       action='store_true',
+                       help='Submit LLM requests through the OpenAI Batch API '
+                            '(lower cost, but jobs may take up to 24h)')
+    parser.add_argument('--parallel-golden',
+                       action='store_true',
+                       help='Evaluate large test-pattern sets with the golden model in parallel processes')
+    parser.add_argument('--candidates',
+                       type=int,
+                       default=1,
+                       help='Sample this many testbenches in one request and keep the first that '
+                            'compiles with iverilog (default: 1)')
+    parser.add_argument('--no-cache',
+                       action='store_true',
+                       help='Always query the LLM instead of reusing cached responses')
+    parser.add_argument('--cache-dir',
+                       help='Directory of the LLM response cache (default: ~/.cache/llm_testbench)')
+    parser.add_argument('--seed',
+                       type=int,
+                       help='Sampling seed for LLM requests (also makes sampled responses cacheable)')
+    parser.add_argument('--debug',
+                       action='store_true',
+                       help='Log full tracebacks on errors')
     parser.add_argument('--example', '-e',
                        action='store_true',
                        help='Run with built-in example')
     
     args = parser.parse_args()
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
     
     # Determine input source
-    if args.example:
+    jobs = None
+    if args.description_glob or args.verilog_glob:
+        if not (args.description_glob and args.verilog_glob):
+            parser.error("--description-glob and --verilog-glob must be used together")
+        description_files = sorted(glob.glob(args.description_glob))
+        verilog_files = sorted(glob.glob(args.verilog_glob))
+        if not verilog_files or len(description_files) != len(verilog_files):
+            parser.error(f"Globs matched {len(description_files)} description and "
+                         f"{len(verilog_files)} Verilog files; they must pair up one-to-one")
+        
+        jobs = []
+        for description_file, verilog_file in zip(description_files, verilog_files):
+            description = read_input(description_file, "Description")
+            verilog_code = read_input(verilog_file, "Verilog")
+            output_dir = os.path.join(args.output, os.path.splitext(os.path.basename(verilog_file))[0])
+            jobs.append((description, verilog_code, output_dir, verilog_file))
+        
+    elif args.example:
         print("Running with example inputs...")
         description = """A 2-to-1 multiplexer (MUX).
 The module takes two 1-bit input signals (a and b) and one 1-bit select signal (sel).
@@ -83,33 +189,21 @@ endmodule"""
         if not args.description or not args.verilog:
             parser.error("--description and --verilog are required when not using --example")
         
-        # Read description file
-        try:
-            with open(args.description, 'r') as f:
-                description = f.read()
-        except FileNotFoundError:
-            print(f"Error: Description file not found: {args.description}")
-            sys.exit(1)
-        except Exception as e:
-            print(f"Error reading description file: {e}")
-            sys.exit(1)
-        
-        # Read Verilog file
-        try:
-            with open(args.verilog, 'r') as f:
-                verilog_code = f.read()
-        except FileNotFoundError:
-            print(f"Error: Verilog file not found: {args.verilog}")
-            sys.exit(1)
-        except Exception as e:
-            print(f"Error reading Verilog file: {e}")
-            sys.exit(1)
+        description = read_input(args.description, "Description")
+        verilog_code = read_input(args.verilog, "Verilog")
     
     # Initialize pipeline
     pipeline = TestbenchPipeline(
         api_key=args.api_key,
         model=args.model,
-        provider=args.provider
+        provider=args.provider,
+        combine_steps=args.combine_steps,
+        rtl_golden=args.rtl_golden,
+        use_batch_api=args.batch_api,
+        cache=LLMCache(args.cache_dir, enabled=not args.no_cache),
+        seed=args.seed,
+        parallel_golden=args.parallel_golden,
+        n_candidates=args.candidates
     )
     
     # Check if LLM is configured
@@ -125,27 +219,27 @@ endmodule"""
     
     # Run the pipeline
     try:
+        if jobs is not None:
+            pipeline.run_many([job[:3] for job in jobs], args.batch_size)
+            print(f"\n✓ Testbench generation completed successfully for {len(jobs)} modules!")
+            print("\n[Step 6] iverilog simulation of the final testbenches and golden verilog models...")
+            for _, _, output_dir, verilog_file in jobs:
+                print(f"\n{verilog_file}:")
+                simulate(verilog_file, output_dir)
+            return 0
+        
         result = pipeline.run(description, verilog_code, args.output)
         print("\n✓ Testbench generation completed successfully!")
         # Step 5: Update testbench with golden outputs
         print("\n[Step 6] iverilog simulation of the final testbench and golden verilog model...")
-        iverilog_command = f"iverilog -g2012 -o {args.output}/out.vvp {args.verilog} {args.output}/testbench_final.v"
-        print("Testbench Compilation......")
-        result = subprocess.run(iverilog_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=120)
-        if result.stderr:
-            print(f"Compilation error: {result.stderr}")
-        else:
-            print("Testbench Simulation......")
-            result = subprocess.run(f"vvp {args.output}/out.vvp", shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=120)
-            if result.stdout:
-                print(f"result:\n{result.stdout}")
+        simulate(args.verilog, args.output)
         
         
         return 0
     except Exception as e:
-        print(f"\n✗ Error during testbench generation: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"\n✗ Error during testbench generation: {e!r}")
+        # Only formatted when --debug enables DEBUG logging
+        logger.debug("Testbench generation failed", exc_info=True)
         return 1
 
 
@@ -3,6 +3,7 @@ LLM-aided Testbench Generation Package
 """
 
 from .llm_client import LLMClient
+from .llm_cache import LLMCache
 from .testbench_generator import TestbenchGenerator
 from .golden_model_generator import GoldenModelGenerator
 from .testbench_updater import TestbenchUpdater
@@ -10,6 +11,7 @@ from .testbench_pipeline import TestbenchPipeline
 
 __all__ = [
     'LLMClient',
+    'LLMCache',
     'TestbenchGenerator',
     'GoldenModelGenerator',
     'TestbenchUpdater',
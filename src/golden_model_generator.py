@@ -2,24 +2,75 @@
 Step 4: Generate Python golden model and compute golden outputs.
 """
 
+import os
 import sys
 import io
+import re
+import ast
 import json
-from typing import Dict, Any, List
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, Iterator, Tuple
 from .llm_client import LLMClient
+from .golden_runner import run_batch, run_vectorized
+
+
+# Fenced code blocks with their language tag
+_CODE_BLOCK_RE = re.compile(r"```(\w*)[^\n`]*\n?(.*?)```", re.DOTALL)
+# Line starting with a def statement ([^\S\n] is whitespace that stays on the line)
+_DEF_LINE_RE = re.compile(r"^[^\S\n]*def ", re.MULTILINE)
+
+# Below this many patterns, starting worker processes costs more than it saves
+PARALLEL_MIN_PATTERNS = 256
+# Patterns sent to a worker per task
+_PARALLEL_CHUNK = 64
+
+# Modules whose use makes a golden model's outputs vary between identical calls
+_NONDETERMINISTIC_MODULES = {'random', 'secrets', 'time', 'uuid'}
+
+# Prompts of the golden model request
+_GOLDEN_SYSTEM_PROMPT = """You are an expert in hardware design and Python programming.
+Your task is to create a Python function that implements the exact same functionality
+as described in the natural language specification."""
+
+_GOLDEN_USER_TEMPLATE = """Given the following natural language description of a hardware module,
+create a Python function that implements this functionality.
+
+Natural Language Description:
+{description}
+
+Module Information:
+- Module Name: {module_name}
+- Inputs: {inputs}
+- Outputs: {outputs}
+
+Create a Python function named '{function_name}' that:
+1. Takes the input signals as parameters
+2. Computes and returns the output signals
+3. Implements the exact functionality described
+4. Handles all edge cases properly
+5. Returns outputs as a dictionary with output signal names as keys
+
+Provide ONLY the Python function code, no explanations.
+Start with 'def {function_name}(' and include complete implementation.
+"""
 
 
 class GoldenModelGenerator:
     """Generate Python golden model and compute expected outputs."""
     
-    def __init__(self, llm_client: LLMClient):
+    def __init__(self, llm_client: LLMClient, parallel: bool = False):
         """
         Initialize golden model generator.
         
         Args:
             llm_client: LLM client instance
+            parallel: Evaluate large pattern sets in worker processes when the
+                      model cannot be compiled as a batch
         """
         self.llm_client = llm_client
+        self.parallel = parallel
     
     def generate_python_model(self, description: str, module_info: Dict[str, Any]) -> str:
         """
@@ -32,41 +83,62 @@ class GoldenModelGenerator:
         Returns:
             Python code implementing the module functionality
         """
-        system_prompt = """You are an expert in hardware design and Python programming.
-Your task is to create a Python function that implements the exact same functionality
-as described in the natural language specification."""
-
-        user_prompt = f"""Given the following natural language description of a hardware module,
-create a Python function that implements this functionality.
-
-Natural Language Description:
-{description}
-
-Module Information:
-- Module Name: {module_info.get('module_name', 'unknown')}
-- Inputs: {module_info.get('inputs', [])}
-- Outputs: {module_info.get('outputs', [])}
-
-Create a Python function named '{module_info.get('module_name', 'module')}_golden' that:
-1. Takes the input signals as parameters
-2. Computes and returns the output signals
-3. Implements the exact functionality described
-4. Handles all edge cases properly
-5. Returns outputs as a dictionary with output signal names as keys
-
-Provide ONLY the Python function code, no explanations.
-Start with 'def {module_info.get('module_name', 'module')}_golden(' and include complete implementation.
-"""
+        response = self.llm_client.generate(**self.build_prompt(description, module_info))
+        return self.parse_response(response)
+    
+    async def agenerate_python_model(self, description: str, module_info: Dict[str, Any]) -> str:
+        """
+        Asynchronous version of generate_python_model().
+        
+        Args:
+            description: Natural language description of the module
+            module_info: Module information (name, inputs, outputs)
+            
+        Returns:
+            Python code implementing the module functionality
+        """
+        response = await self.llm_client.agenerate(**self.build_prompt(description, module_info))
+        return self.parse_response(response)
+    
+    def build_prompt(self, description: str, module_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the golden model generation request.
+        
+        Args:
+            description: Natural language description of the module
+            module_info: Module information (name, inputs, outputs)
+            
+        Returns:
+            Keyword arguments for LLMClient.generate()
+        """
+        system_prompt = _GOLDEN_SYSTEM_PROMPT
+        user_prompt = _GOLDEN_USER_TEMPLATE.format_map({
+            "description": description,
+            "module_name": module_info.get('module_name', 'unknown'),
+            "inputs": module_info.get('inputs', []),
+            "outputs": module_info.get('outputs', []),
+            "function_name": f"{module_info.get('module_name', 'module')}_golden",
+        })
 
-        response = self.llm_client.generate(user_prompt, system_prompt, temperature=0.2, max_tokens=3000)
+        return {"prompt": user_prompt, "system_prompt": system_prompt, "temperature": 0, "max_tokens": 3000}
+    
+    def parse_response(self, response: str) -> str:
+        """
+        Parse the golden model generation response.
         
+        Args:
+            response: LLM response to the request from build_prompt()
+            
+        Returns:
+            Python code implementing the module functionality
+        """
         # Extract Python code
-        python_code = self._extract_python_code(response)
-        
-        return python_code
+        return self._extract_python_code(response)
     
     def compute_golden_outputs(self, python_code: str, test_patterns: List[Dict[str, Any]], 
-                               module_info: Dict[str, Any]) -> List[Dict[str, Any]]:
+                               module_info: Dict[str, Any],
+                               sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+                               in_place: bool = False) -> List[Dict[str, Any]]:
         """
         Execute the Python golden model with test patterns to get expected outputs.
         
@@ -74,51 +146,68 @@ Start with 'def {module_info.get('module_name', 'module')}_golden(' and include
             python_code: Python golden model code
             test_patterns: List of test input patterns
             module_info: Module information
+            sink: Optional callback receiving each pattern with its golden outputs
+                  as soon as it is computed (e.g. to stream them to disk)
+            in_place: Add the outputs to the given pattern dictionaries instead of
+                      copies of them (for callers that no longer need the inputs alone)
             
         Returns:
             List of test patterns with golden outputs added
         """
         results = []
+        function_name = f"{module_info.get('module_name', 'module')}_golden"
         
-        # Execute the Python code in a safe namespace
+        # Reject a malformed response before running any of it
+        try:
+            tree = ast.parse(python_code)
+        except SyntaxError as e:
+            print(f"Error parsing Python code: {e}")
+            return results
+        if not any(isinstance(node, ast.FunctionDef) and node.name == function_name for node in tree.body):
+            print(f"Error: Could not find function {function_name}")
+            return results
+        
+        # Execute the Python code in a safe namespace (compiled from the tree, so it is parsed once)
         namespace = {}
         try:
-            exec(python_code, namespace)
+            exec(compile(tree, '<golden_model>', 'exec'), namespace)
         except Exception as e:
             print(f"Error executing Python code: {e}")
             return results
         
         # Find the golden function
-        function_name = f"{module_info.get('module_name', 'module')}_golden"
         golden_func = namespace.get(function_name)
         
         if not golden_func:
             print(f"Error: Could not find function {function_name}")
             return results
         
-        # Run each test pattern through the golden model
-        for pattern in test_patterns:
-            try:
-                # Extract input values from the pattern
-                inputs = pattern.get('inputs', pattern)
-                
-                # Call the golden function
-                if isinstance(inputs, dict):
-                    outputs = golden_func(**inputs)
-                else:
-                    # If inputs is not a dict, try to call with positional args
-                    outputs = golden_func(*inputs.values()) if hasattr(inputs, 'values') else golden_func(inputs)
-                
-                # Add outputs to the pattern
-                result = pattern.copy()
-                result['expected_outputs'] = outputs
-                results.append(result)
-            except Exception as e:
-                print(f"Error computing golden output for pattern {pattern}: {e}")
-                result = pattern.copy()
-                result['expected_outputs'] = None
-                result['error'] = str(e)
-                results.append(result)
+        # Models in the supported integer subset are evaluated in one compiled batch,
+        # other branch-free ones in one vectorized NumPy call. These checks only select
+        # the evaluation path; they are not a sandbox, and every model has already
+        # been exec'd above to find the golden function.
+        evaluated = None
+        batch_outputs = run_batch(python_code, function_name, test_patterns)
+        if batch_outputs is None:
+            batch_outputs = run_vectorized(python_code, function_name, test_patterns)
+        if batch_outputs is not None:
+            evaluated = [(outputs, None) for outputs in batch_outputs]
+        elif self.parallel and len(test_patterns) >= PARALLEL_MIN_PATTERNS:
+            # Pure-Python models are GIL-bound, so spread large pattern sets over processes
+            evaluated = _evaluate_parallel(python_code, function_name, test_patterns)
+        if evaluated is None:
+            evaluated = _evaluate_serial(golden_func, python_code, test_patterns)
+        
+        # Add outputs to each pattern
+        for pattern, (outputs, error) in zip(test_patterns, evaluated):
+            result = pattern if in_place else pattern.copy()
+            result['expected_outputs'] = outputs
+            if error is not None:
+                print(f"Error computing golden output for pattern {pattern}: {error}")
+                result['error'] = error
+            results.append(result)
+            if sink is not None:
+                sink(result)
         
         return results
     
@@ -132,29 +221,215 @@ Start with 'def {module_info.get('module_name', 'module')}_golden(' and include
         Returns:
             Extracted Python code
         """
-        # Try to find code between ```python and ```
-        if "```python" in text:
-            start = text.find("```python") + len("```python")
-            end = text.find("```", start)
-            if end != -1:
-                return text[start:end].strip()
-        
-        # Try to find code between ``` and ```
-        if "```" in text:
-            parts = text.split("```")
-            if len(parts) >= 3:
-                return parts[1].strip()
-        
-        # If no code blocks found, look for def statement
+        # Prefer a ```python block, then any block defining a function, then the first block
+        blocks = _CODE_BLOCK_RE.findall(text)
+        if blocks:
+            code = next((code for language, code in blocks if language == 'python'), None)
+            if code is None:
+                code = next((code for _, code in blocks if 'def ' in code), blocks[0][1])
+            return code.strip()
+        
+        # If no code blocks found, take everything from the first def statement on
         if "def " in text:
-            lines = text.split('\n')
-            code_lines = []
-            in_function = False
-            for line in lines:
-                if line.strip().startswith('def '):
-                    in_function = True
-                if in_function:
-                    code_lines.append(line)
-            return '\n'.join(code_lines)
+            match = _DEF_LINE_RE.search(text)
+            return text[match.start():] if match else ""
         
         return text.strip()
+
+
+def _evaluate_serial(golden_func: Callable, python_code: str,
+                     test_patterns: List[Dict[str, Any]]) -> Iterator[Tuple[Any, Optional[str]]]:
+    """
+    Evaluate a golden model over test patterns in this process.
+    
+    Args:
+        golden_func: Golden function
+        python_code: Python golden model code
+        test_patterns: List of test input patterns
+        
+    Yields:
+        (outputs, error) per pattern
+    """
+    # Patterns often repeat an input vector, so evaluate each distinct one once
+    memoized = None
+    if _is_deterministic(python_code):
+        memoized = functools.lru_cache(maxsize=None)(lambda items: golden_func(**dict(items)))
+    
+    for pattern in test_patterns:
+        # Extract input values from the pattern
+        inputs = pattern.get('inputs', pattern)
+        try:
+            key = _memo_key(inputs) if memoized is not None else None
+            if key is not None:
+                # Copy so callers mutating one result cannot change the cached entry
+                outputs = _copy_outputs(memoized(key))
+            elif isinstance(inputs, dict):
+                outputs = golden_func(**inputs)
+            else:
+                # If inputs is not a dict, try to call with positional args
+                outputs = golden_func(*inputs.values()) if hasattr(inputs, 'values') else golden_func(inputs)
+        except Exception as e:
+            yield None, str(e)
+        else:
+            yield outputs, None
+
+
+def _evaluate_parallel(python_code: str, function_name: str,
+                       test_patterns: List[Dict[str, Any]]) -> Optional[List[Tuple[Any, Optional[str]]]]:
+    """
+    Evaluate a golden model over test patterns in worker processes.
+    
+    Args:
+        python_code: Python golden model code
+        function_name: Name of the golden function
+        test_patterns: List of test input patterns
+        
+    Returns:
+        (outputs, error) per pattern, or None if the patterns or the model
+        could not be evaluated in worker processes
+    """
+    inputs = [pattern.get('inputs', pattern) for pattern in test_patterns]
+    if not all(isinstance(values, dict) for values in inputs):
+        return None
+    
+    # Send each distinct input vector once, as in the serial loop
+    rows = None
+    if _is_deterministic(python_code):
+        keys = [_memo_key(values) for values in inputs]
+        if None not in keys:
+            positions = {}
+            rows = [positions.setdefault(key, len(positions)) for key in keys]
+            inputs = [dict(key) for key in positions]
+    chunks = [inputs[start:start + _PARALLEL_CHUNK] for start in range(0, len(inputs), _PARALLEL_CHUNK)]
+    
+    # Never fork this process: Numba's threading layer or the pipeline's writer
+    # threads may be running, and a forked child can inherit their held locks
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    try:
+        with ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context(method),
+                                 initializer=_init_worker, initargs=(python_code, function_name)) as executor:
+            evaluated = [item for chunk in executor.map(_evaluate_chunk, chunks) for item in chunk]
+    except Exception as e:
+        print(f"Warning: Parallel golden evaluation failed, falling back to per-pattern loop: {e}")
+        return None
+    
+    if rows is None:
+        return evaluated
+    return [(_copy_outputs(evaluated[row][0]), evaluated[row][1]) for row in rows]
+
+
+# Golden function of a worker process, set up once by _init_worker()
+_worker_func = None
+
+
+def _init_worker(python_code: str, function_name: str) -> None:
+    """Load the golden model in a worker process."""
+    global _worker_func
+    namespace = {}
+    exec(python_code, namespace)
+    _worker_func = namespace[function_name]
+
+
+def _evaluate_chunk(chunk: List[Dict[str, Any]]) -> List[tuple]:
+    """Evaluate a chunk of input dictionaries in a worker process."""
+    evaluated = []
+    for inputs in chunk:
+        try:
+            evaluated.append((_worker_func(**inputs), None))
+        except Exception as e:
+            evaluated.append((None, str(e)))
+    return evaluated
+
+
+def _memo_key(inputs: Any) -> Optional[tuple]:
+    """Return a hashable key for a dictionary of inputs, or None if there is none."""
+    if not isinstance(inputs, dict):
+        return None
+    key = tuple(sorted(inputs.items()))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _copy_outputs(outputs: Any) -> Any:
+    """Return a copy of a memoized output dictionary (its values are plain numbers)."""
+    return dict(outputs) if isinstance(outputs, dict) else outputs
+
+
+def _is_deterministic(python_code: str) -> bool:
+    """
+    Return True if a golden model's outputs depend only on its inputs, so repeated
+    input vectors may share one evaluation.
+    
+    The model must not keep state: no module-level assignments, global or
+    nonlocal names, mutable default arguments, or stores into and method calls
+    on names that are not local to its functions (imported modules may still
+    be called). It must not import a source of randomness or time either.
+    """
+    try:
+        tree = ast.parse(python_code)
+    except SyntaxError:
+        return False
+    
+    modules = set()
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            if not _imports_deterministic(node):
+                return False
+            modules.update(_imported_names(node))
+        elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant):
+            continue
+        elif not isinstance(node, ast.FunctionDef):
+            return False
+    
+    for function in tree.body:
+        if isinstance(function, ast.FunctionDef) and not _is_pure_function(function, modules):
+            return False
+    return True
+
+
+def _is_pure_function(function: ast.FunctionDef, modules: set) -> bool:
+    """Return True if a function (with its nested functions) only changes its own local names."""
+    local_names = set()
+    for node in ast.walk(function):
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            return False
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            if not _imports_deterministic(node):
+                return False
+            local_names.update(_imported_names(node))
+        elif isinstance(node, (ast.FunctionDef, ast.Lambda)):
+            defaults = node.args.defaults + [default for default in node.args.kw_defaults if default is not None]
+            if not all(isinstance(default, ast.Constant) for default in defaults):
+                return False
+            local_names.update(arg.arg for arg in ast.walk(node.args) if isinstance(arg, ast.arg))
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            local_names.add(node.id)
+    
+    for node in ast.walk(function):
+        if isinstance(node, (ast.Attribute, ast.Subscript)) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            allowed = local_names
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            node = node.func
+            allowed = local_names | modules
+        else:
+            continue
+        root = node.value
+        while isinstance(root, (ast.Attribute, ast.Subscript)):
+            root = root.value
+        if not (isinstance(root, ast.Name) and root.id in allowed):
+            return False
+    return True
+
+
+def _imports_deterministic(node: ast.stmt) -> bool:
+    """Return True if an import statement imports no source of randomness or time."""
+    modules = [alias.name for alias in node.names] if isinstance(node, ast.Import) else [node.module or '']
+    return not any(module.split('.')[0] in _NONDETERMINISTIC_MODULES for module in modules)
+
+
+def _imported_names(node: ast.stmt) -> List[str]:
+    """Return the names an import statement binds."""
+    return [(alias.asname or alias.name).split('.')[0] for alias in node.names]
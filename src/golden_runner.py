@@ -0,0 +1,452 @@
+"""
+Batch execution of Python golden models.
+
+Golden models written in a small integer subset of Python (arithmetic,
+comparisons, if/else, for-range loops and min/max/abs) are validated on their
+AST, compiled with Numba and evaluated over every test pattern in one
+parallel call. Other branch-free models may still accept NumPy arrays for
+their inputs and are then evaluated in one vectorized call. Anything else is
+left to the per-pattern loop in GoldenModelGenerator.
+"""
+
+import ast
+import hashlib
+import importlib.util
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+# Generated kernels live here so Numba's cache=True can persist them across runs
+KERNEL_DIR = Path.home() / ".cache" / "llm_testbench" / "golden"
+
+# Below this many patterns the one-time compile outweighs the interpreter loop
+BATCH_MIN_PATTERNS = 256
+
+# Rows re-evaluated in Python to check the kernel, besides the extremes of each input
+_CHECK_SAMPLE = 32
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.IfExp, ast.Compare, ast.Call,
+    ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.FloorDiv, ast.Mod,
+    ast.BitAnd, ast.BitOr, ast.BitXor, ast.LShift, ast.RShift,
+    ast.Invert, ast.USub, ast.UAdd, ast.Not, ast.And, ast.Or,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+# Builtins a model may call; Numba compiles these for integers
+_ALLOWED_CALLS = {'min', 'max', 'abs'}
+
+_KERNEL_TEMPLATE = """# Generated by golden_runner; imported as a registered module so Numba can cache it
+from numba import njit, prange
+
+
+@njit(cache=True, nogil=True)
+{function}
+
+
+@njit(cache=True, parallel=True)
+def batch(_inputs, _out):
+    for _row in prange(_inputs.shape[0]):
+        _result = _golden({args})
+{stores}
+"""
+
+
+if njit is not None:
+    @njit(cache=True, parallel=True)
+    def _warmup_kernel(_inputs, _out):
+        for _row in prange(_inputs.shape[0]):
+            _out[_row, 0] = _inputs[_row, 0] + _inputs[_row, 1]
+            _out[_row, 1] = _inputs[_row, 0] ^ _inputs[_row, 1]
+
+
+def warmup() -> None:
+    """
+    Initialize Numba ahead of the first golden-model batch.
+
+    Runs a tiny kernel with the same shape as generated ones so LLVM and the
+    parallel threading layer are set up before any user-visible timing starts.
+    With cache=True, later processes load the compiled kernel from disk.
+    """
+    if njit is None:
+        return
+    _warmup_kernel(np.zeros((1, 2), dtype=np.int64), np.zeros((1, 2), dtype=np.int64))
+
+
+def run_batch(python_code: str, function_name: str,
+              test_patterns: List[Dict[str, Any]]) -> Optional[List[Dict[str, int]]]:
+    """
+    Evaluate a golden model over all test patterns with a compiled kernel.
+
+    The kernel computes in int64, so a sample of rows (including those with the
+    smallest and largest value of each input) is re-evaluated in Python. Any
+    difference, such as an overflowing product, rejects the batch result, and
+    outputs that Python returns as bools are converted back to bools.
+
+    Pattern values must be integers; the pipeline converts the binary strings
+    of Step 3 before computing golden outputs.
+
+    Args:
+        python_code: Python golden model code
+        function_name: Name of the golden function
+        test_patterns: List of test input patterns
+
+    Returns:
+        List of output dictionaries (one per pattern), or None if the model
+        or the patterns are not suitable for batch evaluation
+    """
+    if njit is None or len(test_patterns) < BATCH_MIN_PATTERNS:
+        return None
+
+    model = _analyze(python_code, function_name)
+    if model is None:
+        return None
+    params, function_source, outputs = model
+
+    rows = _pack_inputs(test_patterns, params)
+    if rows is None:
+        return None
+
+    try:
+        inputs_array = np.asarray(rows, dtype=np.int64)
+        out = np.zeros((len(rows), len(outputs)), dtype=np.int64)
+        kernel = _load_kernel(params, function_source, len(outputs))
+        kernel(inputs_array, out)
+    except Exception as e:
+        # Typing errors (e.g. a path without a return) and runtime errors both land here
+        print(f"Warning: Batch golden evaluation failed, falling back to per-pattern loop: {e}")
+        return None
+
+    results = [dict(zip(outputs, values)) for values in out.tolist()]
+    if not _matches_python(python_code, function_name, params, rows, inputs_array, results):
+        print("Warning: Batch golden evaluation differs from Python (e.g. int64 overflow), "
+              "falling back to per-pattern loop")
+        return None
+    return results
+
+
+def run_vectorized(python_code: str, function_name: str,
+                   test_patterns: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Evaluate a golden model once with a NumPy array of all patterns per input.
+
+    Branch-free models built from operators broadcast over the arrays as they
+    are. Models that branch on an input, loop, or call functions that only
+    accept scalars raise and are rejected. As in run_batch(), the int64 results
+    are checked against the Python model on a sample of rows.
+
+    Args:
+        python_code: Python golden model code
+        function_name: Name of the golden function
+        test_patterns: List of test input patterns
+
+    Returns:
+        List of output dictionaries (one per pattern), or None if the model
+        or the patterns are not suitable for vectorized evaluation
+    """
+    if np is None or len(test_patterns) < BATCH_MIN_PATTERNS:
+        return None
+    first = test_patterns[0].get('inputs', test_patterns[0])
+    if not isinstance(first, dict):
+        return None
+    params = list(first)
+    rows = _pack_inputs(test_patterns, params)
+    if rows is None:
+        return None
+
+    namespace = {}
+    try:
+        inputs_array = np.asarray(rows, dtype=np.int64)
+        exec(python_code, namespace)
+        outputs = namespace[function_name](**{name: inputs_array[:, col] for col, name in enumerate(params)})
+        if not isinstance(outputs, dict) or not outputs:
+            return None
+        columns = []
+        for value in outputs.values():
+            value = np.asarray(value)
+            # Integer or bool columns, one value per pattern (or one for all)
+            if value.dtype.kind not in 'biu' or value.shape not in ((), (len(rows),)):
+                return None
+            columns.append(np.broadcast_to(value, (len(rows),)).tolist())
+    except Exception:
+        return None
+
+    results = [dict(zip(outputs, values)) for values in zip(*columns)]
+    if not _matches_python(python_code, function_name, params, rows, inputs_array, results):
+        return None
+    return results
+
+
+def _pack_inputs(test_patterns: List[Dict[str, Any]], params: List[str]) -> Optional[List[List[int]]]:
+    """
+    Collect the input values of each pattern in parameter order.
+
+    Args:
+        test_patterns: List of test input patterns
+        params: Golden function parameter names
+
+    Returns:
+        One row of integers per pattern, or None if a pattern does not bind
+        exactly the parameters to integers
+    """
+    rows = []
+    for pattern in test_patterns:
+        inputs = pattern.get('inputs', pattern)
+        if not isinstance(inputs, dict) or set(inputs) != set(params):
+            return None
+        row = [inputs[name] for name in params]
+        if not all(isinstance(value, int) for value in row):
+            return None
+        rows.append(row)
+    return rows
+
+
+def _matches_python(python_code: str, function_name: str, params: List[str], rows: List[List[int]],
+                    inputs_array, results: List[Dict[str, int]]) -> bool:
+    """
+    Check batch results against the Python model on a sample of rows.
+
+    Outputs that Python returns as bools are converted in place in results.
+
+    Args:
+        python_code: Python golden model code
+        function_name: Name of the golden function
+        params: Golden function parameter names
+        rows: Input values of each pattern
+        inputs_array: The same inputs as an int64 matrix
+        results: Batch outputs of each pattern
+
+    Returns:
+        True if every sampled row agrees with Python
+    """
+    sample = set(range(0, len(rows), max(1, len(rows) // _CHECK_SAMPLE)))
+    sample.update(int(row) for row in inputs_array.argmin(axis=0))
+    sample.update(int(row) for row in inputs_array.argmax(axis=0))
+    sample.add(len(rows) - 1)
+
+    namespace = {}
+    try:
+        exec(python_code, namespace)
+        golden_func = namespace[function_name]
+        expected = {row: golden_func(**dict(zip(params, rows[row]))) for row in sorted(sample)}
+    except Exception:
+        return False
+
+    bools = set()
+    for row, values in expected.items():
+        if values != results[row]:
+            return False
+        bools.update(name for name, value in values.items() if isinstance(value, bool))
+    # A column must be bool on every sampled row to be restored as bool
+    for name in bools:
+        if not all(isinstance(values[name], bool) for values in expected.values()):
+            return False
+    for result in results:
+        for name in bools:
+            result[name] = bool(result[name])
+    return True
+
+
+def _analyze(python_code: str, function_name: str) -> Optional[Tuple[List[str], str, List[str]]]:
+    """
+    Check whether a golden function can be compiled and rewrite it for the kernel.
+
+    Every statement and expression must come from the supported integer subset,
+    names must be parameters or locals, and every return must be a dictionary
+    literal with the same string keys. The returns are rewritten to tuples in a
+    fixed key order, since Numba cannot return the dictionaries.
+
+    Args:
+        python_code: Python golden model code
+        function_name: Name of the golden function
+
+    Returns:
+        Tuple of (parameter names, source of the rewritten function, output
+        names), or None if the function is not eligible
+    """
+    try:
+        tree = ast.parse(python_code)
+    except SyntaxError:
+        return None
+
+    func = next((node for node in tree.body
+                 if isinstance(node, ast.FunctionDef) and node.name == function_name), None)
+    if func is None or func.decorator_list or func.returns:
+        return None
+
+    args = func.args
+    if args.posonlyargs or args.vararg or args.kwonlyargs or args.kwarg or args.defaults:
+        return None
+    params = [arg.arg for arg in args.args]
+
+    body = func.body
+    if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant):
+        body = body[1:]  # Skip docstring
+    # Binary-string parsing of a parameter is a no-op on the kernel's integer inputs
+    body = [stmt for stmt in body if not _is_binary_string_parse(stmt, params)]
+    if not body:
+        return None
+
+    # Locals may be assigned in any branch, so collect them all up front
+    names = set(params)
+    for node in ast.walk(func):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+    # Kernel locals are underscore-prefixed; keep model names out of that space
+    if any(name.startswith('_') for name in names):
+        return None
+
+    returns = []
+    if not _check_block(body, names, returns) or not returns:
+        return None
+
+    outputs = [key.value for key in returns[0].keys]
+    if not outputs or len(set(outputs)) != len(outputs):
+        return None
+    for returned in returns:
+        values = dict(zip((key.value for key in returned.keys), returned.values))
+        if set(values) != set(outputs):
+            return None
+        # Rewrite in place: return {'y': ...} -> return (...,)
+        returned.values = [values[name] for name in outputs]
+
+    func.name = '_golden'
+    func.body = body
+    source = ast.unparse(_ReturnTuples().visit(func))
+    return params, source, outputs
+
+
+def _is_binary_string_parse(stmt: ast.stmt, params: List[str]) -> bool:
+    """Return True for `x = int(x, 2) if isinstance(x, str) else x` on a parameter x."""
+    if not (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name)):
+        return False
+    name = stmt.targets[0].id
+    expected = f"{name} = int({name}, 2) if isinstance({name}, str) else {name}"
+    return name in params and ast.unparse(stmt) == expected
+
+
+def _check_block(body: List[ast.stmt], names: set, returns: List[ast.Dict]) -> bool:
+    """
+    Validate the statements of a golden function.
+
+    Args:
+        body: Statements to check
+        names: Parameter and local names the statements may read
+        returns: Collects the returned dictionary literals
+
+    Returns:
+        True if every statement is supported
+    """
+    for stmt in body:
+        if isinstance(stmt, ast.Pass):
+            continue
+        if isinstance(stmt, ast.Assign):
+            if not all(isinstance(target, ast.Name) for target in stmt.targets):
+                return False
+            if not _is_arithmetic(stmt.value, names):
+                return False
+        elif isinstance(stmt, ast.AugAssign):
+            if not isinstance(stmt.target, ast.Name) or not isinstance(stmt.op, _ALLOWED_NODES):
+                return False
+            if not _is_arithmetic(stmt.value, names):
+                return False
+        elif isinstance(stmt, ast.If):
+            if not _is_arithmetic(stmt.test, names):
+                return False
+            if not _check_block(stmt.body, names, returns) or not _check_block(stmt.orelse, names, returns):
+                return False
+        elif isinstance(stmt, ast.For):
+            iterator = stmt.iter
+            if (not isinstance(stmt.target, ast.Name) or stmt.orelse
+                    or not isinstance(iterator, ast.Call) or not isinstance(iterator.func, ast.Name)
+                    or iterator.func.id != 'range' or iterator.keywords or not 1 <= len(iterator.args) <= 3):
+                return False
+            if not all(_is_arithmetic(arg, names) for arg in iterator.args):
+                return False
+            if not _check_block(stmt.body, names, returns):
+                return False
+        elif isinstance(stmt, ast.Return):
+            returned = stmt.value
+            if not isinstance(returned, ast.Dict):
+                return False
+            for key, value in zip(returned.keys, returned.values):
+                if not (isinstance(key, ast.Constant) and isinstance(key.value, str)):
+                    return False
+                if not _is_arithmetic(value, names):
+                    return False
+            returns.append(returned)
+        else:
+            return False
+    return True
+
+
+def _is_arithmetic(node: ast.AST, names: set) -> bool:
+    """Return True if an expression only uses integer operators on known names."""
+    callees = set()
+    for child in ast.walk(node):
+        if not isinstance(child, _ALLOWED_NODES):
+            return False
+        if isinstance(child, ast.Call):
+            if (not isinstance(child.func, ast.Name) or child.func.id not in _ALLOWED_CALLS
+                    or child.keywords or not child.args):
+                return False
+            callees.add(id(child.func))
+        elif isinstance(child, ast.Name) and child.id not in names and id(child) not in callees:
+            return False
+        elif isinstance(child, ast.Constant) and not isinstance(child.value, int):
+            return False
+    return True
+
+
+class _ReturnTuples(ast.NodeTransformer):
+    """Turn the (already reordered) returned dictionaries into tuples."""
+
+    def visit_Return(self, node: ast.Return) -> ast.Return:
+        return ast.Return(value=ast.Tuple(elts=node.value.values, ctx=ast.Load()))
+
+
+def _load_kernel(params: List[str], function_source: str, num_outputs: int):
+    """
+    Write the Numba kernel for a golden model to disk and import it.
+
+    Args:
+        params: Golden function parameter names (input columns)
+        function_source: Source of the rewritten golden function
+        num_outputs: Number of output columns
+
+    Returns:
+        Compiled batch(inputs, out) kernel
+    """
+    args = ', '.join(f"_inputs[_row, {col}]" for col in range(len(params)))
+    stores = '\n'.join(f"{' ' * 8}_out[_row, {col}] = _result[{col}]" for col in range(num_outputs))
+    source = _KERNEL_TEMPLATE.format(function=function_source, args=args, stores=stores)
+
+    # Name the module after its source so identical models reuse the Numba cache
+    module_name = f"golden_numba_{hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]}"
+    path = KERNEL_DIR / f"{module_name}.py"
+    if not path.exists():
+        os.makedirs(KERNEL_DIR, exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(source)
+
+    module = sys.modules.get(module_name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        # Numba resolves the cached kernel's call to _golden through sys.modules
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    return module.batch
@@ -0,0 +1,65 @@
+"""
+JSON helpers backed by orjson when it is installed.
+"""
+
+import re
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 19+ digit runs may be integers beyond 64 bits, which orjson parses as floats
+_WIDE_INT_RE = re.compile(r"\d{19}")
+_WIDE_INT_BYTES_RE = re.compile(rb"\d{19}")
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """
+    Serialize an object to UTF-8 encoded JSON.
+
+    Args:
+        obj: Object to serialize (NumPy arrays are supported)
+        indent: Pretty-print with a 2-space indent
+
+    Returns:
+        Encoded JSON document
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, option=option)
+        except TypeError:
+            # orjson rejects integers wider than 64 bits; let the stdlib handle those
+            pass
+    return json.dumps(obj, indent=2 if indent else None, default=_default).encode('utf-8')
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Parse a JSON document.
+
+    Documents that may hold integers wider than 64 bits are parsed with the
+    stdlib, which keeps them exact.
+
+    Args:
+        data: JSON text or UTF-8 encoded bytes
+
+    Returns:
+        Parsed object
+    """
+    wide_int_re = _WIDE_INT_RE if isinstance(data, str) else _WIDE_INT_BYTES_RE
+    if orjson is not None and not wide_int_re.search(data):
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _default(obj: Any) -> Any:
+    """Convert NumPy values for the stdlib encoder."""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
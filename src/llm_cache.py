@@ -0,0 +1,143 @@
+"""
+Disk-backed cache for deterministic LLM responses.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "llm_testbench"
+
+# Most recently used responses also kept in memory, so repeats within a process skip the disk
+MEMORY_ENTRIES = 256
+
+
+class LLMCache:
+    """Cache LLM completions on disk, keyed by the full request payload."""
+
+    def __init__(self, cache_dir: Optional[str] = None, ttl: Optional[float] = 7 * 24 * 3600,
+                 enabled: bool = True):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding cached responses (default: ~/.cache/llm_testbench)
+            ttl: Time-to-live of an entry in seconds (None disables expiry)
+            enabled: Whether responses are cached at all
+        """
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else DEFAULT_CACHE_DIR
+        self.ttl = ttl
+        self.enabled = enabled
+        self.stats = {"hits": 0, "misses": 0}
+        # key -> (creation time, response), least recently used first
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cache_key(self, model: str, messages: List[Dict[str, str]], temperature: float,
+                  tools: Optional[List[Dict[str, Any]]] = None, max_tokens: Optional[int] = None,
+                  response_format: Optional[Dict[str, Any]] = None, seed: Optional[int] = None) -> Optional[str]:
+        """
+        Compute the cache key for a chat completion request.
+
+        Only deterministic requests are cacheable: temperature == 0, or a fixed seed.
+
+        Args:
+            model: Model name
+            messages: Chat messages sent to the model
+            temperature: Sampling temperature
+            tools: Optional tool definitions sent with the request
+            max_tokens: Maximum tokens to generate
+            response_format: Optional response format sent with the request
+            seed: Sampling seed sent with the request
+
+        Returns:
+            Hex digest key, or None if the request should not be cached
+        """
+        if not self.enabled or (temperature != 0 and seed is None):
+            return None
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "tools": tools,
+            "max_tokens": max_tokens,
+            "response_format": response_format,
+            "seed": seed,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Cache key from cache_key()
+
+        Returns:
+            Cached response text, or None on a miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[0]):
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1]
+
+        path = self._path(key)
+        try:
+            created = path.stat().st_mtime
+            if self._expired(created):
+                self.stats["misses"] += 1
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                response = json.load(f)["response"]
+        except (OSError, ValueError, KeyError):
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        self._remember(key, created, response)
+        return response
+
+    def set(self, key: str, response: str) -> None:
+        """
+        Store a response in the cache.
+
+        Args:
+            key: Cache key from cache_key()
+            response: Response text to store
+        """
+        created = time.time()
+        self._remember(key, created, response)
+        path = self._path(key)
+        # Write under a temporary name first, so a concurrent get() never reads a partial entry
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"response": response, "created": created}, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not write LLM cache entry: {e}")
+
+    def _remember(self, key: str, created: float, response: str) -> None:
+        """Keep a response in memory, evicting the least recently used one if full."""
+        with self._lock:
+            self._memory[key] = (created, response)
+            self._memory.move_to_end(key)
+            if len(self._memory) > MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+
+    def _expired(self, created: float) -> bool:
+        """Return True if an entry created at this time is older than the TTL."""
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _path(self, key: str) -> Path:
+        """Return the file path of a cache entry."""
+        return self.cache_dir / f"{key}.json"
@@ -5,15 +5,38 @@ Supports multiple LLM providers (OpenAI, Anthropic, etc.)
 
 import os
 import json
-from typing import Optional, Dict, Any
+import time
+import asyncio
+import weakref
+from typing import Optional, Dict, Any, Iterator, AsyncIterator, List, Tuple
 from xml.parsers.expat import model
+import importlib.util
 import openai
+from .llm_cache import LLMCache
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# HTTP/2 needs the optional h2 package; fall back to pooled HTTP/1.1 without it
+_HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Model families that accept response_format={"type": "json_object"}; base gpt-4 does not
+_JSON_MODE_MODELS = ("gpt-4o", "gpt-4-turbo", "gpt-4-1106", "gpt-4-0125", "gpt-4.1", "gpt-3.5-turbo", "o1", "o3", "o4")
+
+# Retry transient API errors (429/5xx, dropped connections) with the SDK's backoff
+_MAX_RETRIES = 3
+# Fail fast on connect, but leave room for long non-streaming generations (Step 5
+# returns the whole testbench at once), which the SDK's own default also allows
+_TIMEOUT = httpx.Timeout(600.0, connect=5.0) if httpx is not None else 600.0
 
 
 class LLMClient:
     """Client for interacting with LLM APIs."""
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4", provider: str = "openai"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4", provider: str = "openai",
+                 cache: Optional[LLMCache] = None, seed: Optional[int] = None):
         """
         Initialize LLM client.
         
@@ -21,14 +44,30 @@ class LLMClient:
             api_key: API key for the LLM provider (if None, reads from environment)
             model: Model name to use
             provider: LLM provider ('openai', 'anthropic', etc.)
+            cache: Response cache for deterministic requests (default: on-disk LLMCache)
+            seed: Sampling seed sent with every request, which also makes
+                  requests with temperature > 0 cacheable
         """
         self.provider = provider
         self.model = model
+        self.seed = seed
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        self.client = openai.OpenAI(api_key=api_key)
+        self.cache = cache if cache is not None else LLMCache()
+        # Only build the API client when credentials exist, so mock mode works offline
+        self.client = None
+        if self.is_available():
+            # Keep connections alive across calls so each request skips the TCP/TLS handshake
+            http_client = None
+            if httpx is not None:
+                http_client = httpx.Client(http2=_HTTP2, limits=httpx.Limits(keepalive_expiry=60))
+            self.client = openai.OpenAI(api_key=self.api_key, max_retries=_MAX_RETRIES, timeout=_TIMEOUT,
+                                        http_client=http_client)
+        # Async clients are bound to the event loop they were first used on
+        self._async_clients = weakref.WeakKeyDictionary()
     
     def generate(self, prompt: str, system_prompt: Optional[str] = None, 
-                 temperature: float = 0.7, max_tokens: int = 4000) -> str:
+                 temperature: float = 0.7, max_tokens: int = 4000,
+                 response_format: Optional[Dict[str, Any]] = None) -> str:
         """
         Generate text using the LLM.
         
@@ -37,30 +76,335 @@ class LLMClient:
             system_prompt: System prompt for the model
             temperature: Sampling temperature (0-1)
             max_tokens: Maximum tokens to generate
+            response_format: Optional response format (e.g. {"type": "json_object"})
             
         Returns:
             Generated text response
         """
         try:
             if self.provider == "openai":
-                messages = []
-                if system_prompt:
-                    messages.append({"role": "system", "content": system_prompt})
-                messages.append({"role": "user", "content": prompt})
+                messages = self._messages(prompt, system_prompt)
+
+                # Serve deterministic requests from the cache when possible
+                key, cached = self._lookup(messages, temperature, max_tokens, response_format)
+                if cached is not None:
+                    return cached
 
                 response = self.client.chat.completions.create(
                     model=self.model,
                     messages=messages,
                     temperature=temperature,
                     max_tokens=max_tokens,
+                    **self._request_kwargs(response_format),
                 )
-                return response.choices[0].message.content
+                content = response.choices[0].message.content
+                if key is not None:
+                    self.cache.set(key, content)
+                return content
             else:
                 raise ValueError(f"Unsupported provider: {self.provider}")
         except Exception as e:
             print(f"Error generating response: {e}")
             return f"Error: {str(e)}"
     
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None,
+                        temperature: float = 0.7, max_tokens: int = 4000,
+                        response_format: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Generate text using the LLM without blocking the event loop.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: System prompt for the model
+            temperature: Sampling temperature (0-1)
+            max_tokens: Maximum tokens to generate
+            response_format: Optional response format (e.g. {"type": "json_object"})
+            
+        Returns:
+            Generated text response
+        """
+        try:
+            if self.provider == "openai":
+                messages = self._messages(prompt, system_prompt)
+
+                # Serve deterministic requests from the cache when possible
+                key, cached = self._lookup(messages, temperature, max_tokens, response_format)
+                if cached is not None:
+                    return cached
+
+                response = await self._async_client().chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **self._request_kwargs(response_format),
+                )
+                content = response.choices[0].message.content
+                if key is not None:
+                    self.cache.set(key, content)
+                return content
+            else:
+                raise ValueError(f"Unsupported provider: {self.provider}")
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            return f"Error: {str(e)}"
+    
+    def generate_candidates(self, prompt: str, system_prompt: Optional[str] = None, n: int = 2,
+                            temperature: float = 0.7, max_tokens: int = 4000,
+                            response_format: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        Generate several alternative responses to one prompt in a single request.
+        
+        The choices are sampled together (the API's n parameter), so they cost one
+        round-trip. They are not cached, as they only differ through sampling.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: System prompt for the model
+            n: Number of responses
+            temperature: Sampling temperature (0-1), above 0 for the responses to differ
+            max_tokens: Maximum tokens to generate per response
+            response_format: Optional response format (e.g. {"type": "json_object"})
+            
+        Returns:
+            Generated text responses (a single "Error: ..." entry on failure)
+        """
+        try:
+            if self.provider != "openai":
+                raise ValueError(f"Unsupported provider: {self.provider}")
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt, system_prompt),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                n=n,
+                **self._request_kwargs(response_format),
+            )
+            return [choice.message.content for choice in response.choices]
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            return [f"Error: {str(e)}"]
+    
+    def generate_stream(self, prompt: str, system_prompt: Optional[str] = None,
+                        temperature: float = 0.7, max_tokens: int = 4000,
+                        response_format: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Generate text using the LLM, yielding it as it is produced.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: System prompt for the model
+            temperature: Sampling temperature (0-1)
+            max_tokens: Maximum tokens to generate
+            response_format: Optional response format (e.g. {"type": "json_object"})
+            
+        Yields:
+            Chunks of the generated text (a cached response arrives as one chunk)
+        """
+        try:
+            if self.provider != "openai":
+                raise ValueError(f"Unsupported provider: {self.provider}")
+            messages = self._messages(prompt, system_prompt)
+
+            # Serve deterministic requests from the cache when possible
+            key, cached = self._lookup(messages, temperature, max_tokens, response_format)
+            if cached is not None:
+                yield cached
+                return
+
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                **self._request_kwargs(response_format),
+            )
+            parts = []
+            for chunk in stream:
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    parts.append(content)
+                    yield content
+            if key is not None:
+                self.cache.set(key, "".join(parts))
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            yield f"Error: {str(e)}"
+    
+    async def agenerate_stream(self, prompt: str, system_prompt: Optional[str] = None,
+                               temperature: float = 0.7, max_tokens: int = 4000,
+                               response_format: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Asynchronous version of generate_stream().
+        
+        Args:
+            prompt: User prompt
+            system_prompt: System prompt for the model
+            temperature: Sampling temperature (0-1)
+            max_tokens: Maximum tokens to generate
+            response_format: Optional response format (e.g. {"type": "json_object"})
+            
+        Yields:
+            Chunks of the generated text (a cached response arrives as one chunk)
+        """
+        try:
+            if self.provider != "openai":
+                raise ValueError(f"Unsupported provider: {self.provider}")
+            messages = self._messages(prompt, system_prompt)
+
+            # Serve deterministic requests from the cache when possible
+            key, cached = self._lookup(messages, temperature, max_tokens, response_format)
+            if cached is not None:
+                yield cached
+                return
+
+            stream = await self._async_client().chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                **self._request_kwargs(response_format),
+            )
+            parts = []
+            async for chunk in stream:
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    parts.append(content)
+                    yield content
+            if key is not None:
+                self.cache.set(key, "".join(parts))
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            yield f"Error: {str(e)}"
+    
+    def generate_batch(self, requests: Dict[str, Dict[str, Any]], poll_interval: float = 30.0) -> Dict[str, str]:
+        """
+        Generate several responses with a single OpenAI Batch API job.
+        
+        Batch jobs are billed at a discount but complete asynchronously, so this
+        blocks until the job finishes (up to its 24h completion window).
+        
+        Args:
+            requests: Keyword arguments for generate(), keyed by a unique request ID
+            poll_interval: Seconds between job status checks
+            
+        Returns:
+            Generated text response for each request ID ("Error: ..." on failure)
+        """
+        results = {}
+        lines = []
+        keys = {}
+        for custom_id, request in requests.items():
+            messages = self._messages(request["prompt"], request.get("system_prompt"))
+            temperature = request.get("temperature", 0.7)
+            max_tokens = request.get("max_tokens", 4000)
+            response_format = request.get("response_format")
+            key, cached = self._lookup(messages, temperature, max_tokens, response_format)
+            if cached is not None:
+                results[custom_id] = cached
+                continue
+            keys[custom_id] = key
+            
+            body = {
+                "model": self.model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                **self._request_kwargs(response_format),
+            }
+            lines.append(json.dumps({"custom_id": custom_id, "method": "POST",
+                                     "url": "/v1/chat/completions", "body": body}))
+        
+        if not lines:
+            return results
+        
+        try:
+            if self.provider != "openai":
+                raise ValueError(f"Unsupported provider: {self.provider}")
+            
+            batch_input = self.client.files.create(file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+                                                   purpose="batch")
+            batch = self.client.batches.create(input_file_id=batch_input.id, endpoint="/v1/chat/completions",
+                                               completion_window="24h")
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                time.sleep(poll_interval)
+                batch = self.client.batches.retrieve(batch.id)
+            
+            if batch.output_file_id:
+                for line in self.client.files.content(batch.output_file_id).text.splitlines():
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    custom_id = entry["custom_id"]
+                    response = entry.get("response") or {}
+                    if response.get("status_code") != 200:
+                        results[custom_id] = f"Error: {entry.get('error') or response.get('body')}"
+                        continue
+                    content = response["body"]["choices"][0]["message"]["content"]
+                    if keys.get(custom_id) is not None:
+                        self.cache.set(keys[custom_id], content)
+                    results[custom_id] = content
+            
+            for custom_id in keys:
+                if custom_id not in results:
+                    results[custom_id] = f"Error: batch {batch.id} {batch.status} without a result"
+        except Exception as e:
+            print(f"Error generating batch responses: {e}")
+            for custom_id in keys:
+                results.setdefault(custom_id, f"Error: {str(e)}")
+        
+        return results
+    
+    def _async_client(self) -> "openai.AsyncOpenAI":
+        """Return the async API client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            # Same keep-alive pool as the sync client; closed by aclose() before the loop ends
+            http_client = None
+            if httpx is not None:
+                http_client = httpx.AsyncClient(http2=_HTTP2, limits=httpx.Limits(keepalive_expiry=60))
+            client = openai.AsyncOpenAI(api_key=self.api_key, max_retries=_MAX_RETRIES, timeout=_TIMEOUT,
+                                        http_client=http_client)
+            self._async_clients[loop] = client
+        return client
+    
+    async def aclose(self) -> None:
+        """Close the async API client of the running event loop, if one was created."""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+    
+    def _lookup(self, messages: list, temperature: float, max_tokens: int,
+                response_format: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Optional[str]]:
+        """Return the cache key of a request (None if uncacheable) and its cached response, if any."""
+        key = self.cache.cache_key(self.model, messages, temperature, max_tokens=max_tokens,
+                                   response_format=response_format, seed=self.seed)
+        return key, self.cache.get(key) if key is not None else None
+    
+    def _request_kwargs(self, response_format: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Return the optional request parameters that are set."""
+        kwargs = {}
+        if response_format is not None:
+            kwargs["response_format"] = response_format
+        if self.seed is not None:
+            kwargs["seed"] = self.seed
+        return kwargs
+    
+    def _messages(self, prompt: str, system_prompt: Optional[str]) -> list:
+        """Build the chat messages for a prompt."""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
+    def supports_json_mode(self) -> bool:
+        """Check if the model accepts JSON mode (response_format={"type": "json_object"})."""
+        return self.model.startswith(_JSON_MODE_MODELS)
+    
     def is_available(self) -> bool:
         """Check if the LLM client is properly configured."""
         return self.api_key is not None and len(self.api_key) > 0
@@ -0,0 +1,82 @@
+"""
+Step 6: Compile and simulate testbenches with Icarus Verilog.
+"""
+
+import sys
+import shutil
+import subprocess
+import threading
+from typing import Callable, List, Optional
+
+
+# Resolve the tools once instead of walking PATH on every invocation
+_IVERILOG = shutil.which("iverilog")
+_VVP = shutil.which("vvp")
+
+# Python's own descriptors are non-inheritable, so on Linux the child can skip
+# the close-all-fds loop and use the faster spawn path
+_CLOSE_FDS = not sys.platform.startswith("linux")
+
+
+def compile_testbench(sources: List[str], output_path: str, timeout: int = 120) -> subprocess.CompletedProcess:
+    """
+    Compile Verilog sources into a vvp simulation binary.
+
+    Args:
+        sources: Verilog source files (module under test and testbench)
+        output_path: Path of the compiled simulation binary
+        timeout: Timeout in seconds
+
+    Returns:
+        Completed iverilog process with captured stdout/stderr
+    """
+    command = [_IVERILOG or "iverilog", "-g2012", "-o", output_path, *sources]
+    return _run(command, timeout)
+
+
+def run_simulation(vvp_path: str, timeout: int = 120,
+                   on_line: Optional[Callable[[str], None]] = None) -> subprocess.CompletedProcess:
+    """
+    Run a compiled simulation binary.
+
+    Args:
+        vvp_path: Path of the compiled simulation binary
+        timeout: Timeout in seconds
+        on_line: Optional callback receiving each output line as the simulation
+                 produces it (stderr is then merged into stdout)
+
+    Returns:
+        Completed vvp process with captured stdout/stderr
+    """
+    command = [_VVP or "vvp", vvp_path]
+    if on_line is None:
+        return _run(command, timeout)
+
+    try:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, text=True, bufsize=1, close_fds=_CLOSE_FDS)
+    except FileNotFoundError:
+        return subprocess.CompletedProcess(command, 127, "", f"{command[0]}: command not found\n")
+
+    # Reading blocks on the pipe, so the timeout is enforced by killing the process
+    timer = threading.Timer(timeout, process.kill)
+    timer.start()
+    lines = []
+    try:
+        with process:
+            for line in process.stdout:
+                lines.append(line)
+                on_line(line)
+    finally:
+        timer.cancel()
+    return subprocess.CompletedProcess(command, process.returncode, "".join(lines), "")
+
+
+def _run(command: List[str], timeout: int) -> subprocess.CompletedProcess:
+    """Run a tool without a shell, capturing its output."""
+    try:
+        return subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, text=True, timeout=timeout, close_fds=_CLOSE_FDS)
+    except FileNotFoundError:
+        # Report a missing tool the way a shell would rather than raising
+        return subprocess.CompletedProcess(command, 127, "", f"{command[0]}: command not found\n")
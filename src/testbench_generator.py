@@ -2,41 +2,43 @@
 Step 3: Generate testbench with test patterns (without golden outputs).
 """
 
-from typing import Dict, Any, List
+import re
+from typing import Dict, Any, List, Optional, Tuple, Callable
 from .llm_client import LLMClient
+from . import json_io
 
 
-class TestbenchGenerator:
-    """Generate Verilog testbench with test patterns using LLM."""
-    
-    def __init__(self, llm_client: LLMClient):
-        """
-        Initialize testbench generator.
-        
-        Args:
-            llm_client: LLM client instance
-        """
-        self.llm_client = llm_client
-    
-    def generate_testbench(self, description: str, verilog_code: str) -> Dict[str, Any]:
-        """
-        Generate testbench with comprehensive test patterns.
-        
-        Args:
-            description: Natural language description of the Verilog module
-            verilog_code: Verilog code to be tested
-            
-        Returns:
-            Dictionary containing:
-                - testbench_code: Verilog testbench code (without expected outputs)
-                - test_patterns: List of test input patterns
-                - module_info: Information about module (name, inputs, outputs)
-        """
-        # First, extract module information
-        module_info = self._extract_module_info(verilog_code)
-        
-        # Generate comprehensive test patterns
-        system_prompt = """You are an expert in Verilog testbench generation. 
+# Module header and port declarations, matched over the whole source. A port
+# declaration runs until ';', ')' or the next direction keyword, so it covers
+# both ANSI headers and "input wire a, b, sel;" bodies.
+_COMMENT_RE = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+_MODULE_RE = re.compile(r"\bmodule\s+(\w+)")
+_PORT_RE = re.compile(
+    r"\b(input|output)\b((?:\s+(?:wire|reg|logic|signed))*)\s*(\[[^\]]*\])?"
+    r"([^;)]*?)(?=[;)]|\b(?:input|output|inout)\b)"
+)
+_PORT_NAME_RE = re.compile(r"\s*(\w+)")
+
+# Sections of a response; the markers may carry a note, e.g. "TEST_PATTERNS (a list ...):"
+_TESTBENCH_RE = re.compile(r"TESTBENCH_CODE\b[^`]*?```verilog\s*(.*?)```", re.DOTALL)
+_PATTERNS_RE = re.compile(r"TEST_PATTERNS\b[^`]*?```json\s*(.*?)```", re.DOTALL)
+
+# Outermost JSON object of a combined response
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+# LLM quirks in otherwise valid JSON: trailing commas before a closing bracket
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+# Indexed sections of a batched response
+_BATCH_TESTBENCH_RE = re.compile(r"TESTBENCH_CODE\[(\d+)\]:\s*```verilog(.*?)```", re.DOTALL)
+_BATCH_PATTERNS_RE = re.compile(r"TEST_PATTERNS\[(\d+)\][^\n]*\s*```json(.*?)```", re.DOTALL)
+
+# Output budget per module in a batched request, and for the whole request
+_BATCH_TOKENS_PER_MODULE = 4000
+_BATCH_MAX_TOKENS = 16000
+
+# Prompts are constant, so repeated requests share a byte-identical prefix
+_TESTBENCH_SYSTEM_PROMPT = """You are an expert in Verilog testbench generation. 
 Your task is to generate comprehensive test patterns for a given Verilog module.
 Generate test patterns that cover:
 1. All corner cases
@@ -45,7 +47,7 @@ Generate test patterns that cover:
 4. Edge cases
 5. Random values for thorough testing"""
 
-        user_prompt = f"""Given the following Verilog module and its natural language description, 
+_TESTBENCH_USER_TEMPLATE = """Given the following Verilog module and its natural language description, 
 generate a comprehensive Verilog testbench that includes ALL possible test patterns.
 
 Natural Language Description:
@@ -78,15 +80,207 @@ TEST_PATTERNS (a list of dictionaries. Each dictionary contains only input signa
 ```
 """
 
-        response = self.llm_client.generate(user_prompt, system_prompt, max_tokens=4000)
+_COMBINED_SYSTEM_PROMPT = """You are an expert in Verilog testbench generation, hardware design and Python programming.
+Your task is to generate comprehensive test patterns for a given Verilog module, and a Python
+function that implements the exact same functionality as described in the natural language specification.
+Generate test patterns that cover:
+1. All corner cases
+2. Boundary values
+3. Typical use cases
+4. Edge cases
+5. Random values for thorough testing"""
+
+_COMBINED_USER_TEMPLATE = """Given the following Verilog module and its natural language description,
+generate a comprehensive Verilog testbench and a Python golden model.
+
+Natural Language Description:
+{description}
+
+Verilog Module Code:
+{verilog_code}
+
+Module Information:
+- Module Name: {module_name}
+- Inputs: {inputs}
+- Outputs: {outputs}
+
+The testbench must:
+1. Declare all necessary signals
+2. Instantiate the module under test
+3. Include a systematic set of test patterns covering all cases
+4. Use $display to show inputs for each test (all $display statements are in the initial block and before $finish statement.)
+5. NOT include expected outputs or assertions yet (we will add those later)
+6. Number each test case
+
+The golden model must be a Python function named '{function_name}' that:
+1. Takes the input signals as parameters
+2. Computes and returns the output signals
+3. Implements the exact functionality described
+4. Handles all edge cases properly
+5. Returns outputs as a dictionary with output signal names as keys
+
+Return a JSON object with exactly these fields:
+- "testbench": the complete Verilog testbench code
+- "test_patterns": a list of dictionaries. Each dictionary contains only input signal names mapped to their values as plain binary strings (no prefixes like 0b, no spaces). Do not include any test_number field
+- "golden_model": the complete Python function code, starting with 'def {function_name}('
+"""
+
+_BATCH_SYSTEM_PROMPT = """You are an expert in Verilog testbench generation. 
+Your task is to generate comprehensive test patterns for each of the given Verilog modules.
+Generate test patterns that cover:
+1. All corner cases
+2. Boundary values
+3. Typical use cases
+4. Edge cases
+5. Random values for thorough testing"""
+
+_BATCH_USER_TEMPLATE = """You will receive {count} Verilog modules indexed [0]..[{last_index}], each with its
+natural language description. For each module, generate a comprehensive Verilog testbench
+that includes ALL possible test patterns.
+
+{modules}
+
+Each testbench must:
+1. Declare all necessary signals
+2. Instantiate the module under test
+3. Include a systematic set of test patterns covering all cases
+4. Use $display to show inputs for each test (all $display statements are in the initial block and before $finish statement.)
+5. NOT include expected outputs or assertions yet (we will add those later)
+6. Number each test case
+
+Format your response as follows, for every index i from 0 to {last_index}:
+TESTBENCH_CODE[i]:
+```verilog
+[testbench code of module i here]
+```
+
+TEST_PATTERNS[i] (a list of dictionaries. Each dictionary contains only input signal names mapped to their values as plain binary strings (no prefixes like 0b, no spaces). Do not include any test_number field):
+```json
+[array of test patterns of module i]
+```
+"""
+
+
+class TestbenchGenerator:
+    """Generate Verilog testbench with test patterns using LLM."""
+    
+    def __init__(self, llm_client: LLMClient):
+        """
+        Initialize testbench generator.
+        
+        Args:
+            llm_client: LLM client instance
+        """
+        self.llm_client = llm_client
+    
+    def generate_testbench(self, description: str, verilog_code: str,
+                           on_testbench: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        Generate testbench with comprehensive test patterns.
+        
+        Args:
+            description: Natural language description of the Verilog module
+            verilog_code: Verilog code to be tested
+            on_testbench: Called with the testbench code as soon as it has been
+                          streamed, while the test patterns are still being generated
+            
+        Returns:
+            Dictionary containing:
+                - testbench_code: Verilog testbench code (without expected outputs)
+                - test_patterns: List of test input patterns
+                - module_info: Information about module (name, inputs, outputs)
+        """
+        request = self.build_prompt(description, verilog_code)
+        if on_testbench is None:
+            response = self.llm_client.generate(**request)
+        else:
+            watcher = _SectionWatcher(_TESTBENCH_RE, on_testbench)
+            for chunk in self.llm_client.generate_stream(**request):
+                watcher.feed(chunk)
+            response = watcher.text()
+        return self.parse_response(response, verilog_code)
+    
+    def generate_testbench_candidates(self, description: str, verilog_code: str, n: int,
+                                      temperature: float = 0.8) -> List[Dict[str, Any]]:
+        """
+        Generate several alternative testbenches for a module in one LLM request.
+        
+        Args:
+            description: Natural language description of the Verilog module
+            verilog_code: Verilog code to be tested
+            n: Number of candidates
+            temperature: Sampling temperature, so that the candidates differ
+            
+        Returns:
+            Result of generate_testbench() for each candidate
+        """
+        request = dict(self.build_prompt(description, verilog_code), temperature=temperature)
+        responses = self.llm_client.generate_candidates(n=n, **request)
+        return [self.parse_response(response, verilog_code) for response in responses]
+    
+    async def agenerate_testbench(self, description: str, verilog_code: str,
+                                  on_testbench: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        Asynchronous version of generate_testbench().
+        
+        Args:
+            description: Natural language description of the Verilog module
+            verilog_code: Verilog code to be tested
+            on_testbench: Called with the testbench code as soon as it has been streamed
+            
+        Returns:
+            Dictionary with the same keys as generate_testbench()
+        """
+        request = self.build_prompt(description, verilog_code)
+        if on_testbench is None:
+            response = await self.llm_client.agenerate(**request)
+        else:
+            watcher = _SectionWatcher(_TESTBENCH_RE, on_testbench)
+            async for chunk in self.llm_client.agenerate_stream(**request):
+                watcher.feed(chunk)
+            response = watcher.text()
+        return self.parse_response(response, verilog_code)
+    
+    def build_prompt(self, description: str, verilog_code: str) -> Dict[str, Any]:
+        """
+        Build the testbench generation request.
+        
+        Args:
+            description: Natural language description of the Verilog module
+            verilog_code: Verilog code to be tested
+            
+        Returns:
+            Keyword arguments for LLMClient.generate()
+        """
+        # Generate comprehensive test patterns
+        system_prompt = _TESTBENCH_SYSTEM_PROMPT
+        user_prompt = _TESTBENCH_USER_TEMPLATE.format_map({
+            "description": description,
+            "verilog_code": verilog_code,
+        })
+
+        return {"prompt": user_prompt, "system_prompt": system_prompt, "temperature": 0, "max_tokens": 4000}
+    
+    def parse_response(self, response: str, verilog_code: str) -> Dict[str, Any]:
+        """
+        Parse the testbench generation response.
+        
+        Args:
+            response: LLM response to the request from build_prompt()
+            verilog_code: Verilog code to be tested
+            
+        Returns:
+            Dictionary with the same keys as generate_testbench()
+        """
+        module_info = self._extract_module_info(verilog_code)
         
         # Parse the response
-        testbench_code = self._extract_section(response, "TESTBENCH_CODE:", "```verilog", "```")
-        test_patterns_json = self._extract_section(response, "TEST_PATTERNS:", "```json", "```")
+        testbench_code = self._extract_section(response, _TESTBENCH_RE)
+        test_patterns_json = self._extract_section(response, _PATTERNS_RE)
         
         try:
-            test_patterns = eval(test_patterns_json) if test_patterns_json else []
-        except:
+            test_patterns = self._load_patterns(test_patterns_json) if test_patterns_json else []
+        except ValueError:
             test_patterns = []
             print("Warning: Could not parse test patterns JSON")
         
@@ -97,6 +291,121 @@ TEST_PATTERNS (a list of dictionaries. Each dictionary contains only input signa
             "raw_response": response
         }
     
+    def generate_testbench_and_model(self, description: str, verilog_code: str) -> Optional[Dict[str, Any]]:
+        """
+        Generate the testbench, test patterns and Python golden model in one LLM call.
+        
+        Steps 3 and 4 only depend on the description and Verilog code, so both
+        artifacts can be requested together as a single JSON object.
+        
+        Args:
+            description: Natural language description of the Verilog module
+            verilog_code: Verilog code to be tested
+            
+        Returns:
+            Dictionary with the same keys as generate_testbench(), plus:
+                - python_code: Python golden model code ("" if missing)
+            or None if the response could not be parsed
+        """
+        module_info = self._extract_module_info(verilog_code)
+        function_name = f"{module_info.get('module_name', 'module')}_golden"
+        
+        system_prompt = _COMBINED_SYSTEM_PROMPT
+        user_prompt = _COMBINED_USER_TEMPLATE.format_map({
+            "description": description,
+            "verilog_code": verilog_code,
+            "module_name": module_info.get('module_name', 'unknown'),
+            "inputs": module_info.get('inputs', []),
+            "outputs": module_info.get('outputs', []),
+            "function_name": function_name,
+        })
+
+        # Models without JSON mode are only asked for JSON by the prompt
+        response_format = {"type": "json_object"} if self.llm_client.supports_json_mode() else None
+        response = self.llm_client.generate(user_prompt, system_prompt, temperature=0, max_tokens=6000,
+                                            response_format=response_format)
+        
+        try:
+            # Without JSON mode the object may come wrapped in a code fence or prose
+            match = _JSON_OBJECT_RE.search(response)
+            payload = json_io.loads(match.group(0) if match else response)
+            testbench_code = payload["testbench"]
+            test_patterns = payload.get("test_patterns") or []
+        except (ValueError, KeyError, TypeError):
+            print("Warning: Could not parse combined testbench/golden model response")
+            return None
+        
+        return {
+            "testbench_code": testbench_code.strip(),
+            "test_patterns": test_patterns,
+            "module_info": module_info,
+            "python_code": (payload.get("golden_model") or "").strip(),
+            "raw_response": response
+        }
+    
+    def generate_testbench_batch(self, items: List[Tuple[str, str]], batch_size: int = 4) -> List[Dict[str, Any]]:
+        """
+        Generate testbenches for several modules, packing up to batch_size modules per LLM call.
+        
+        Args:
+            items: (description, verilog_code) pair of each module
+            batch_size: Maximum number of modules per request (capped so the
+                        combined response fits in the output token limit)
+            
+        Returns:
+            Result of generate_testbench() for each item, in order
+        """
+        batch_size = max(1, min(batch_size, _BATCH_MAX_TOKENS // _BATCH_TOKENS_PER_MODULE))
+        results = []
+        for start in range(0, len(items), batch_size):
+            results.extend(self._generate_chunk(items[start:start + batch_size]))
+        return results
+    
+    def _generate_chunk(self, items: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Generate testbenches for one batch, halving it if the response is incomplete."""
+        if len(items) == 1:
+            return [self.generate_testbench(*items[0])]
+        
+        modules = "\n\n".join(
+            f"[{index}]\nNatural Language Description:\n{description}\n\nVerilog Module Code:\n{verilog_code}"
+            for index, (description, verilog_code) in enumerate(items)
+        )
+        system_prompt = _BATCH_SYSTEM_PROMPT
+        user_prompt = _BATCH_USER_TEMPLATE.format_map({
+            "last_index": len(items) - 1,
+            "count": len(items),
+            "modules": modules,
+        })
+
+        response = self.llm_client.generate(user_prompt, system_prompt, temperature=0,
+                                            max_tokens=_BATCH_TOKENS_PER_MODULE * len(items))
+        # A failed request is not a truncated one, and smaller batches would only repeat the failure
+        if response.startswith("Error:"):
+            return [self.parse_response(response, verilog_code) for _, verilog_code in items]
+        
+        testbenches = {int(index): code.strip() for index, code in _BATCH_TESTBENCH_RE.findall(response)}
+        patterns = {}
+        for index, patterns_json in _BATCH_PATTERNS_RE.findall(response):
+            try:
+                patterns[int(index)] = self._load_patterns(patterns_json)
+            except ValueError:
+                pass
+        
+        if any(index not in testbenches or index not in patterns for index in range(len(items))):
+            print(f"Warning: Incomplete batched response for {len(items)} modules, retrying in smaller batches")
+            half = len(items) // 2
+            return self._generate_chunk(items[:half]) + self._generate_chunk(items[half:])
+        
+        return [
+            {
+                "testbench_code": testbenches[index],
+                "test_patterns": patterns[index],
+                "module_info": self._extract_module_info(verilog_code),
+                "raw_response": response
+            }
+            for index, (_, verilog_code) in enumerate(items)
+        ]
+    
     def _extract_module_info(self, verilog_code: str) -> Dict[str, Any]:
         """
         Extract module information (name, inputs, outputs) from Verilog code.
@@ -107,28 +416,20 @@ TEST_PATTERNS (a list of dictionaries. Each dictionary contains only input signa
         Returns:
             Dictionary with module information
         """
-        lines = verilog_code.strip().split('\n')
-        module_name = ""
+        source = _COMMENT_RE.sub(' ', verilog_code)
+        module_match = _MODULE_RE.search(source)
+        module_name = module_match.group(1) if module_match else ""
         inputs = []
         outputs = []
         
-        for line in lines:
-            line = line.strip()
-            if line.startswith('module'):
-                # Extract module name
-                parts = line.split()
-                if len(parts) >= 2:
-                    module_name = parts[1].split('(')[0]
-            elif 'input' in line:
-                # Extract input signals
-                input_part = line.replace('input', '').replace(';', '').replace(',', '').strip()
-                if input_part:
-                    inputs.append(input_part)
-            elif 'output' in line:
-                # Extract output signals
-                output_part = line.replace('output', '').replace(';', '').replace(',', '').strip()
-                if output_part:
-                    outputs.append(output_part)
+        for direction, kind, width, names in _PORT_RE.findall(source):
+            # One entry per declared name, keeping its type and range, e.g. "wire [3:0] a"
+            declaration = ' '.join(kind.split() + ([width] if width else []))
+            for name in names.split(','):
+                name_match = _PORT_NAME_RE.match(name)
+                if name_match:
+                    port = f"{declaration} {name_match.group(1)}".strip()
+                    (inputs if direction == 'input' else outputs).append(port)
         
         return {
             "module_name": module_name,
@@ -136,37 +437,74 @@ TEST_PATTERNS (a list of dictionaries. Each dictionary contains only input signa
             "outputs": outputs
         }
     
-    def _extract_section(self, text: str, marker: str, start_delim: str, end_delim: str) -> str:
+    def _load_patterns(self, patterns_json: str) -> Any:
         """
-        Extract a section from the LLM response between delimiters.
+        Parse the test patterns JSON, tolerating trailing commas and single quotes.
         
         Args:
-            text: Full response text
-            marker: Section marker to find
-            start_delim: Start delimiter (e.g., "```verilog")
-            end_delim: End delimiter (e.g., "```")
+            patterns_json: JSON text of the test patterns
             
         Returns:
-            Extracted section content
+            Parsed test patterns
+            
+        Raises:
+            ValueError: If the text is not valid JSON even after cleanup
         """
         try:
-            # Find the marker
-            marker_idx = text.find(marker)
-            if marker_idx == -1:
-                return ""
-            
-            # Find the start delimiter after the marker
-            start_idx = text.find(start_delim, marker_idx)
-            if start_idx == -1:
-                return ""
-            start_idx += len(start_delim)
-            
-            # Find the end delimiter
-            end_idx = text.find(end_delim, start_idx)
-            if end_idx == -1:
-                return ""
+            return json_io.loads(patterns_json)
+        except ValueError:
+            cleaned = _TRAILING_COMMA_RE.sub(r"\1", patterns_json).replace("'", '"')
+            return json_io.loads(cleaned)
+    
+    def _extract_section(self, text: str, section_re: re.Pattern) -> str:
+        """
+        Extract a section from the LLM response.
+        
+        Args:
+            text: Full response text
+            section_re: Compiled pattern capturing the section content (e.g., _TESTBENCH_RE)
             
-            return text[start_idx:end_idx].strip()
-        except Exception as e:
-            print(f"Error extracting section: {e}")
-            return ""
+        Returns:
+            Extracted section content ("" if the section is missing)
+        """
+        match = section_re.search(text)
+        return match.group(1).strip() if match else ""
+
+
+class _SectionWatcher:
+    """Collect a streamed response and report one section as soon as it is complete."""
+    
+    # Characters received between searches, so the scan stays linear in practice
+    CHECK_INTERVAL = 512
+    
+    def __init__(self, section_re: re.Pattern, callback: Callable[[str], None]):
+        """
+        Initialize the watcher.
+        
+        Args:
+            section_re: Compiled pattern capturing the section content
+            callback: Called once with the stripped section content
+        """
+        self.section_re = section_re
+        self.callback = callback
+        self.parts = []
+        self.pending = 0
+    
+    def feed(self, chunk: str) -> None:
+        """Add a chunk of the response, reporting the section if it just completed."""
+        self.parts.append(chunk)
+        if self.callback is None:
+            return
+        self.pending += len(chunk)
+        # Any backtick may complete a fence split across chunks
+        if self.pending < self.CHECK_INTERVAL and '`' not in chunk:
+            return
+        self.pending = 0
+        match = self.section_re.search(self.text())
+        if match:
+            callback, self.callback = self.callback, None
+            callback(match.group(1).strip())
+    
+    def text(self) -> str:
+        """Return the response received so far."""
+        return "".join(self.parts)
@@ -2,13 +2,20 @@
 Main pipeline orchestrating the entire testbench generation process.
 """
 
-import json
 import os
-from typing import Dict, Any, Optional
+import asyncio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple, Callable
 from .llm_client import LLMClient
+from .llm_cache import LLMCache
 from .testbench_generator import TestbenchGenerator
 from .golden_model_generator import GoldenModelGenerator
 from .testbench_updater import TestbenchUpdater
+from . import json_io
+from . import simulator
+from .verilog_model import synthesize_golden_model
 import subprocess
 
 class TestbenchPipeline:
@@ -23,7 +30,10 @@ class TestbenchPipeline:
     5. Update testbench with golden outputs and verification logic
     """
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4", provider: str = "openai"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4", provider: str = "openai",
+                 cache: Optional[LLMCache] = None, combine_steps: bool = False,
+                 rtl_golden: bool = False, use_batch_api: bool = False, seed: Optional[int] = None,
+                 parallel_golden: bool = False, n_candidates: int = 1):
         """
         Initialize the pipeline.
         
@@ -31,13 +41,30 @@ class TestbenchPipeline:
             api_key: API key for LLM provider
             model: Model name to use
             provider: LLM provider name
+            cache: LLM response cache (default: on-disk LLMCache)
+            combine_steps: Request the testbench and golden model in a single LLM call
+            rtl_golden: Derive the golden model from the Verilog itself when the module
+                        only has continuous assignments (skips the LLM, but the model then
+                        mirrors the RTL instead of the description)
+            use_batch_api: Submit the LLM requests as OpenAI Batch API jobs (discounted,
+                           but each job may take up to 24h to complete)
+            seed: Sampling seed for the LLM requests
+            parallel_golden: Evaluate large pattern sets in worker processes when the
+                             golden model cannot be compiled
+            n_candidates: Number of testbenches sampled in Step 3; the first one that
+                          compiles with iverilog is kept
         """
-        self.llm_client = LLMClient(api_key, model, provider)
+        self.combine_steps = combine_steps
+        self.n_candidates = n_candidates
+        self.rtl_golden = rtl_golden
+        self.use_batch_api = use_batch_api
+        self.llm_client = LLMClient(api_key, model, provider, cache, seed)
         self.testbench_gen = TestbenchGenerator(self.llm_client)
-        self.golden_gen = GoldenModelGenerator(self.llm_client)
+        self.golden_gen = GoldenModelGenerator(self.llm_client, parallel_golden)
         self.testbench_updater = TestbenchUpdater(self.llm_client)
         
-    def run(self, description: str, verilog_code: str, output_dir: str = "output") -> Dict[str, Any]:
+    def run(self, description: str, verilog_code: str, output_dir: str = "output",
+            testbench_result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Run the complete testbench generation pipeline.
         
@@ -45,16 +72,57 @@ class TestbenchPipeline:
             description: Natural language description of the module
             verilog_code: Verilog code to be tested
             output_dir: Directory to save output files
+            testbench_result: Step 3 result generated ahead of time (see run_many())
             
         Returns:
             Dictionary containing all generated artifacts
         """
+        coroutine = self.arun(description, verilog_code, output_dir, testbench_result)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+        # Called from inside an event loop (e.g. a notebook): run on a fresh loop in another thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+    
+    async def arun(self, description: str, verilog_code: str, output_dir: str = "output",
+                   testbench_result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Run the complete testbench generation pipeline as a coroutine.
+        
+        The testbench (Step 3) and golden model (Step 4) requests only depend on
+        the inputs, so they are sent concurrently.
+        
+        Args:
+            description: Natural language description of the module
+            verilog_code: Verilog code to be tested
+            output_dir: Directory to save output files
+            testbench_result: Step 3 result generated ahead of time (see run_many())
+            
+        Returns:
+            Dictionary containing all generated artifacts
+        """
+        # Output files are written in the background while later steps run
+        writer = ThreadPoolExecutor(max_workers=4)
+        try:
+            return await self._arun(description, verilog_code, output_dir, testbench_result, writer)
+        finally:
+            # Also reached when a step fails, so no writer thread or connection outlives the run
+            writer.shutdown()
+            # The async HTTP client belongs to this event loop, which run() discards afterwards
+            await self.llm_client.aclose()
+    
+    async def _arun(self, description: str, verilog_code: str, output_dir: str,
+                    testbench_result: Optional[Dict[str, Any]], writer: ThreadPoolExecutor) -> Dict[str, Any]:
+        """Run the pipeline steps of arun(), writing output files with writer."""
         print("=" * 80)
         print("LLM-Aided Testbench Generation Pipeline")
         print("=" * 80)
         
         # Create output directory
         os.makedirs(output_dir, exist_ok=True)
+        writes = []
         
         # Step 1 & 2: Input handling (description and verilog code are already provided)
         print("\n[Step 1-2] Input: Natural language description and Verilog code received")
@@ -63,31 +131,30 @@ class TestbenchPipeline:
         
         # Step 3: Generate testbench with test patterns
         print("\n[Step 3] Generating testbench with test patterns...")
-        if not self.llm_client.is_available():
-            print("WARNING: LLM client not configured. Using mock generation.")
-            testbench_result = self._mock_testbench_generation(verilog_code)
-        else:
-            testbench_result = self.testbench_gen.generate_testbench(description, verilog_code)
+        initial_tb_path = os.path.join(output_dir, "testbench_initial.v")
+        streamed = []
+        
+        def save_streamed_testbench(testbench_code: str) -> None:
+            # Runs while the test patterns are still being generated
+            _write_file(initial_tb_path, testbench_code.encode('utf-8'))
+            streamed.append(testbench_code)
+            print(f"  - Testbench received, saved to {initial_tb_path} while test patterns are generated")
+        
+        if testbench_result is None:
+            testbench_result = await self._agenerate_testbench(description, verilog_code, save_streamed_testbench)
         
         print(f"  - Generated testbench with {len(testbench_result['test_patterns'])} test patterns")
         print(f"  - Module: {testbench_result['module_info']['module_name']}")
         
         # Save initial testbench (without golden outputs)
-        initial_tb_path = os.path.join(output_dir, "testbench_initial.v")
-        with open(initial_tb_path, 'w') as f:
-            f.write(testbench_result['testbench_code'])
+        if streamed != [testbench_result['testbench_code']]:
+            writes.append(writer.submit(_write_file, initial_tb_path,
+                                        testbench_result['testbench_code'].encode('utf-8')))
         print(f"  - Saved initial testbench to: {initial_tb_path}")
         
         # Step 4: Generate Python golden model and compute golden outputs
         print("\n[Step 4] Generating Python golden model and computing expected outputs...")
-        if not self.llm_client.is_available():
-            print("WARNING: LLM client not configured. Using mock golden model.")
-            python_code = self._mock_python_model(testbench_result['module_info'])
-        else:
-            python_code = self.golden_gen.generate_python_model(
-                description, 
-                testbench_result['module_info']
-            )
+        python_code = self._golden_model(description, verilog_code, testbench_result)
         
         print(f"  - Generated Python golden model ({len(python_code)} characters)")
         
@@ -102,42 +169,60 @@ class TestbenchPipeline:
 
         # Save Python golden model
         python_path = os.path.join(output_dir, "golden_model.py")
-        with open(python_path, 'w') as f:
-            f.write(python_code)
+        writes.append(writer.submit(_write_file, python_path, python_code.encode('utf-8')))
         print(f"  - Saved Python golden model to: {python_path}")
         
-        # Compute golden outputs
+        # Compute golden outputs, streaming them to disk as they are produced
         print("  - Computing golden outputs for all test patterns...")
-        test_patterns_with_outputs = self.golden_gen.compute_golden_outputs(
-            python_code,
-            testbench_result['test_patterns'],
-            testbench_result['module_info']
-        )
+        patterns_path = os.path.join(output_dir, "test_patterns_with_golden.json")
+        pattern_writer = _PatternWriter(patterns_path)
+        try:
+            test_patterns_with_outputs = self.golden_gen.compute_golden_outputs(
+                python_code,
+                testbench_result['test_patterns'],
+                testbench_result['module_info'],
+                sink=pattern_writer.add,
+                # The patterns were parsed for this run, so skip copying each one
+                in_place=True
+            )
+        except BaseException:
+            # Leave no truncated JSON file behind
+            pattern_writer.discard()
+            raise
+        writes.append(writer.submit(pattern_writer.close))
         
         successful_patterns = sum(1 for p in test_patterns_with_outputs 
                                  if 'expected_outputs' in p and p['expected_outputs'] is not None)
         print(f"  - Successfully computed outputs for {successful_patterns}/{len(test_patterns_with_outputs)} patterns")
         
-        # Save test patterns with golden outputs
-        patterns_path = os.path.join(output_dir, "test_patterns_with_golden.json")
-        with open(patterns_path, 'w') as f:
-            json.dump(test_patterns_with_outputs, f, indent=2)
         print(f"  - Saved test patterns with golden outputs to: {patterns_path}")
         
         # Step 5: Update testbench with golden outputs
         print("\n[Step 5] Updating testbench with golden outputs and verification logic...")
-        final_testbench = self.testbench_updater.update_testbench(
-            testbench_result['testbench_code'],
-            test_patterns_with_outputs,
-            testbench_result['module_info']
-        )
+        if self.use_batch_api and self.llm_client.is_available():
+            # Second batch job: the update needs the golden outputs from Step 4
+            request = self.testbench_updater.build_prompt(
+                testbench_result['testbench_code'], test_patterns_with_outputs, testbench_result['module_info'])
+            response = self.llm_client.generate_batch({"update": request})["update"]
+            final_testbench = self.testbench_updater.parse_response(
+                response, testbench_result['testbench_code'], test_patterns_with_outputs,
+                testbench_result['module_info'])
+        else:
+            final_testbench = self.testbench_updater.update_testbench(
+                testbench_result['testbench_code'],
+                test_patterns_with_outputs,
+                testbench_result['module_info']
+            )
         
         # Save final testbench
         final_tb_path = os.path.join(output_dir, "testbench_final.v")
-        with open(final_tb_path, 'w') as f:
-            f.write(final_testbench)
+        writes.append(writer.submit(_write_file, final_tb_path, final_testbench.encode('utf-8')))
         print(f"  - Saved final testbench to: {final_tb_path}")
         
+        # Every file must be on disk before the caller simulates the testbench
+        for write in writes:
+            write.result()
+        
         print("\n" + "=" * 80)
         print("Pipeline completed successfully!")
         print("=" * 80)
@@ -160,6 +245,188 @@ class TestbenchPipeline:
             'output_dir': output_dir
         }
     
+    def run_many(self, jobs: List[Tuple[str, str, str]], batch_size: int = 4) -> List[Dict[str, Any]]:
+        """
+        Run the pipeline for several modules.
+        
+        The Step 3 requests of up to batch_size modules are packed into a single
+        LLM call; the remaining steps run per module.
+        
+        Args:
+            jobs: (description, verilog_code, output_dir) of each module
+            batch_size: Maximum number of modules per Step 3 request
+            
+        Returns:
+            Result of run() for each job, in order
+        """
+        testbench_results = [None] * len(jobs)
+        if self.llm_client.is_available() and not (self.use_batch_api or self.combine_steps) \
+                and self.n_candidates == 1:
+            testbench_results = self.testbench_gen.generate_testbench_batch(
+                [(description, verilog_code) for description, verilog_code, _ in jobs], batch_size)
+        
+        return [
+            self.run(description, verilog_code, output_dir, testbench_result)
+            for (description, verilog_code, output_dir), testbench_result in zip(jobs, testbench_results)
+        ]
+    
+    def _generate_testbench(self, description: str, verilog_code: str) -> Dict[str, Any]:
+        """
+        Produce the Step 3 testbench and test patterns.
+        
+        Args:
+            description: Natural language description of the module
+            verilog_code: Verilog code to be tested
+            
+        Returns:
+            Result of Step 3
+        """
+        if not self.llm_client.is_available():
+            print("WARNING: LLM client not configured. Using mock generation.")
+            return self._mock_testbench_generation(verilog_code)
+        
+        testbench_result = None
+        if self.use_batch_api:
+            testbench_result = self._batch_generate(description, verilog_code)
+        elif self.combine_steps:
+            testbench_result = self.testbench_gen.generate_testbench_and_model(description, verilog_code)
+        if testbench_result is None and self.n_candidates > 1:
+            testbench_result = self._select_testbench(
+                self.testbench_gen.generate_testbench_candidates(description, verilog_code, self.n_candidates),
+                verilog_code)
+        if testbench_result is None:
+            testbench_result = self.testbench_gen.generate_testbench(description, verilog_code)
+        return testbench_result
+    
+    async def _agenerate_testbench(self, description: str, verilog_code: str,
+                                   on_testbench: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        Produce the Step 3 result, requesting the golden model alongside it.
+        
+        Args:
+            description: Natural language description of the module
+            verilog_code: Verilog code to be tested
+            on_testbench: Called with the testbench code as soon as it has been streamed
+            
+        Returns:
+            Result of Step 3, with the golden model under 'python_code' if it was requested
+        """
+        if not self.llm_client.is_available() or self.use_batch_api or self.combine_steps:
+            return self._generate_testbench(description, verilog_code)
+        
+        # Module info comes from the Verilog, so the golden model need not wait for the testbench
+        module_info = self.testbench_gen._extract_module_info(verilog_code)
+        if self.n_candidates > 1:
+            # Candidates are compile-checked before one is kept, so none is streamed
+            testbench_task = asyncio.create_task(
+                asyncio.to_thread(self._generate_testbench, description, verilog_code))
+        else:
+            testbench_task = asyncio.create_task(
+                self.testbench_gen.agenerate_testbench(description, verilog_code, on_testbench))
+        if self.rtl_golden and synthesize_golden_model(verilog_code, module_info.get('module_name', '')):
+            return await testbench_task
+        golden_task = asyncio.create_task(self.golden_gen.agenerate_python_model(description, module_info))
+        
+        testbench_result, python_code = await asyncio.gather(testbench_task, golden_task)
+        testbench_result['python_code'] = python_code
+        return testbench_result
+    
+    def _select_testbench(self, candidates: List[Dict[str, Any]], verilog_code: str) -> Dict[str, Any]:
+        """
+        Pick the candidate testbench to keep.
+        
+        Candidates with test patterns are compiled against the module with iverilog
+        in parallel; the first that compiles is kept. Without one (or without
+        iverilog), the first candidate with test patterns is kept.
+        
+        Args:
+            candidates: Step 3 results, in order of preference
+            verilog_code: Verilog code to be tested
+            
+        Returns:
+            The selected Step 3 result
+        """
+        usable = [candidate for candidate in candidates
+                  if candidate['testbench_code'] and candidate['test_patterns']] or candidates
+        if len(usable) == 1:
+            return usable[0]
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            module_path = os.path.join(temp_dir, "module.v")
+            _write_file(module_path, verilog_code.encode('utf-8'))
+            
+            def compiles(index: int) -> bool:
+                testbench_path = os.path.join(temp_dir, f"testbench_{index}.v")
+                _write_file(testbench_path, usable[index]['testbench_code'].encode('utf-8'))
+                result = simulator.compile_testbench([module_path, testbench_path],
+                                                     os.path.join(temp_dir, f"candidate_{index}.vvp"))
+                return result.returncode == 0
+            
+            # Each check is an iverilog subprocess, so threads suffice to run them in parallel
+            with ThreadPoolExecutor(max_workers=len(usable)) as executor:
+                compiled = list(executor.map(compiles, range(len(usable))))
+        
+        if True in compiled:
+            index = compiled.index(True)
+            print(f"  - Kept candidate testbench {index + 1} of {len(candidates)}, the first that compiles")
+            return usable[index]
+        print(f"  - None of the {len(candidates)} candidate testbenches compiled; keeping the first")
+        return usable[0]
+    
+    def _batch_generate(self, description: str, verilog_code: str) -> Dict[str, Any]:
+        """
+        Request the testbench and golden model in one Batch API job.
+        
+        Args:
+            description: Natural language description of the module
+            verilog_code: Verilog code to be tested
+            
+        Returns:
+            Result of Step 3, with the golden model under 'python_code'
+        """
+        module_info = self.testbench_gen._extract_module_info(verilog_code)
+        requests = {"tb": self.testbench_gen.build_prompt(description, verilog_code)}
+        if not (self.rtl_golden and synthesize_golden_model(verilog_code, module_info.get('module_name', ''))):
+            requests["golden"] = self.golden_gen.build_prompt(description, module_info)
+        
+        responses = self.llm_client.generate_batch(requests)
+        testbench_result = self.testbench_gen.parse_response(responses["tb"], verilog_code)
+        if "golden" in responses:
+            testbench_result['python_code'] = self.golden_gen.parse_response(responses["golden"])
+        return testbench_result
+    
+    def _golden_model(self, description: str, verilog_code: str, testbench_result: Dict[str, Any]) -> str:
+        """
+        Produce the Python golden model for Step 4.
+        
+        Args:
+            description: Natural language description of the module
+            verilog_code: Verilog code to be tested
+            testbench_result: Result of Step 3
+            
+        Returns:
+            Python golden model code
+        """
+        module_info = testbench_result['module_info']
+        if self.rtl_golden:
+            python_code = synthesize_golden_model(verilog_code, module_info.get('module_name', ''))
+            if python_code:
+                print("  - Derived golden model from the module's continuous assignments")
+                return python_code
+        
+        if not self.llm_client.is_available():
+            print("WARNING: LLM client not configured. Using mock golden model.")
+            return self._mock_python_model(module_info)
+        
+        if testbench_result.get('python_code'):
+            # Already produced together with the testbench in Step 3
+            python_code = testbench_result['python_code']
+            if "```" in python_code:
+                python_code = self.golden_gen._extract_python_code(python_code)
+            return python_code
+        
+        return self.golden_gen.generate_python_model(description, module_info)
+    
     def _mock_testbench_generation(self, verilog_code: str) -> Dict[str, Any]:
         """Mock testbench generation when LLM is not available."""
         return {
@@ -174,4 +441,58 @@ class TestbenchPipeline:
     
     def _mock_python_model(self, module_info: Dict[str, Any]) -> str:
         """Mock Python model generation when LLM is not available."""
-        return f"# Mock Python model - LLM not configured\ndef {module_info['module_name']}_golden():\n    pass\n"
\ No newline at end of file
+        return f"# Mock Python model - LLM not configured\ndef {module_info['module_name']}_golden():\n    pass\n"
+
+
+def _write_file(path: str, data: bytes) -> None:
+    """Write pre-encoded bytes to a file, skipping text-mode encoding and newline translation."""
+    Path(path).write_bytes(data)
+
+
+class _PatternWriter:
+    """
+    Stream patterns with golden outputs to a JSON file as they are computed.
+    
+    The file holds the same indented list as json.dump(patterns, f, indent=2),
+    written in chunks so the serialized document is never held in memory.
+    """
+    
+    CHUNK_ROWS = 4096
+    
+    def __init__(self, path: str):
+        """
+        Open the output file.
+        
+        Args:
+            path: Path of the JSON file to write
+        """
+        self._file = open(path, 'wb')
+        self._pending = []
+        self._written = False
+    
+    def add(self, pattern: Dict[str, Any]) -> None:
+        """Append one pattern (the sink of compute_golden_outputs)."""
+        self._pending.append(pattern)
+        if len(self._pending) >= self.CHUNK_ROWS:
+            self._flush()
+    
+    def close(self) -> None:
+        """Write the remaining patterns and the closing bracket, then close the file."""
+        self._flush()
+        self._file.write(b'\n]' if self._written else b'[]')
+        self._file.close()
+    
+    def discard(self) -> None:
+        """Close and delete the partially written file."""
+        self._file.close()
+        os.remove(self._file.name)
+    
+    def _flush(self) -> None:
+        """Write the buffered patterns."""
+        if not self._pending:
+            return
+        # Indented chunks without their "[\n" and "\n]" join into one list
+        encoded = json_io.dumps(self._pending, indent=True)[2:-2]
+        self._file.write((b',\n' if self._written else b'[\n') + encoded)
+        self._pending = []
+        self._written = True
@@ -2,10 +2,137 @@
 Step 5: Update testbench with golden outputs.
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 import re
-import json
+import textwrap
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from .llm_client import LLMClient
+from . import json_io
+
+# Prompts of the testbench update request
+_UPDATE_SYSTEM_PROMPT = """You are an expert in Verilog testbench development and verification.
+Your task is to update a testbench by adding comprehensive verification logic and expected output checks.
+You should:
+1. Add verification for each test case using the provided expected outputs
+2. Track passed and failed test counts
+3. Display clear pass/fail messages for each output signal
+4. Generate a comprehensive test summary at the end
+5. Maintain the original testbench structure and style
+6. Use proper Verilog syntax and best practices"""
+
+_UPDATE_USER_TEMPLATE = """Given the following Verilog testbench and test patterns with expected outputs,
+update the testbench to include verification logic that checks the actual outputs against the expected outputs.
+
+Original Testbench Code:
+```verilog
+{testbench_code}
+```
+
+Module Information:
+- Module Name: {module_name}
+- Inputs: {inputs}
+- Outputs: {outputs}
+
+Test Patterns with Expected Outputs:
+```json
+{patterns}
+```
+
+Please update the testbench to:
+1. Add integer variables 'passed_tests' and 'failed_tests' at the beginning of the initial block (initialized to 0)
+2. After each test case (identified by $display statements), add a delay (#10) for outputs to settle
+3. For each output signal, compare the actual value against the expected value from the test patterns
+4. Display "✓" for passing checks and "✗" for failing checks with actual and expected values
+5. Increment passed_tests for each passing check and failed_tests for each failing check
+6. At the end of the initial block (before 'end'), add a test summary showing:
+   - Total tests run
+   - Number passed
+   - Number failed
+7. Preserve all original test case displays and structure
+8. Use proper indentation and formatting
+
+Provide ONLY the complete updated testbench code, no explanations.
+Format your response as:
+```verilog
+[updated testbench code here]
+```
+"""
+
+# Rule-based check of one output signal against its expected value
+_VERIFICATION_TEMPLATE = (
+    "{indent}if ({name} === {expected}) begin\n"
+    '{indent}    $display("  ✓ {name} = %b (expected: {expected})", {name});\n'
+    "{indent}    passed_tests = passed_tests + 1;\n"
+    "{indent}end else begin\n"
+    '{indent}    $display("  ✗ {name} = %b (expected: {expected})", {name});\n'
+    "{indent}    failed_tests = failed_tests + 1;\n"
+    "{indent}end"
+)
+# Prompts of the per-test-case check requests a large update is split into
+_CHECKS_SYSTEM_PROMPT = """You are an expert in Verilog testbench development and verification.
+Your task is to write the output checks of individual testbench test cases."""
+
+_CHECKS_USER_TEMPLATE = """A testbench for the module below applies the following test cases in order.
+For each test case, write the Verilog statements that compare every output against its expected value
+once the outputs have settled, display "✓" for a passing and "✗" for a failing check with the actual
+and expected values, and increment the integer variable passed_tests or failed_tests for each check.
+
+Module Information:
+- Module Name: {module_name}
+- Outputs: {outputs}
+
+Test Cases with Expected Outputs (the "test" field is the test case index):
+```json
+{patterns}
+```
+
+Provide ONLY the checks of test cases {first} to {last}, each formatted as:
+CHECK[index]:
+```verilog
+[statements]
+```
+"""
+
+# Test cases per check request, and the number of requests in flight at once
+UPDATE_CHUNK_PATTERNS = 64
+_UPDATE_MAX_WORKERS = 8
+
+# Checks of one test case in a check response
+_CHECK_RE = re.compile(r"CHECK\[(\d+)\]:\s*```verilog(.*?)```", re.DOTALL)
+
+# Fenced code blocks of a response; a ```verilog block is preferred over the first block
+_VERILOG_BLOCK_RE = re.compile(r"```verilog(.*?)```", re.DOTALL)
+_CODE_BLOCK_RE = re.compile(r"```(.*?)```", re.DOTALL)
+
+# Lines that start an initial block, mark a test case, or may end the block, classified
+# in that order of priority by the named group that matches ([^\S\n] is whitespace that
+# stays on the line); each match runs to the end of its line
+_MARKER_LINE_RE = re.compile(
+    r"^(?:(?P<initial>(?=.*initial)(?=.*begin))"
+    r"|(?P<test>(?=.*\$display)(?=.*[Tt]est))"
+    r"|(?P<end>[^\S\n]*end)).*",
+    re.MULTILINE,
+)
+
+# Leading whitespace of a line, measured in one scan without building the stripped line
+_LEADING_SPACE_RE = re.compile(r"\s*")
+
+# Indentation strings by width
+_INDENTS = {}
+
+# Test result counters declared after "initial begin", as one block of lines followed by an empty line
+_COUNTER_BLOCK = "    integer passed_tests = 0;\n    integer failed_tests = 0;\n"
+
+# Test summary added before the end of the initial block (each line gets the block's indent)
+_SUMMARY_LINES = (
+    "// Test Summary",
+    '$display("\\n========== Test Summary ==========");',
+    '$display("Total Tests: %0d", passed_tests + failed_tests);',
+    '$display("Passed: %0d", passed_tests);',
+    '$display("Failed: %0d", failed_tests);',
+    '$display("==================================\\n");',
+)
 
 
 class TestbenchUpdater:
@@ -55,59 +182,101 @@ class TestbenchUpdater:
         Returns:
             Updated testbench code with verification logic
         """
-        system_prompt = """You are an expert in Verilog testbench development and verification.
-Your task is to update a testbench by adding comprehensive verification logic and expected output checks.
-You should:
-1. Add verification for each test case using the provided expected outputs
-2. Track passed and failed test counts
-3. Display clear pass/fail messages for each output signal
-4. Generate a comprehensive test summary at the end
-5. Maintain the original testbench structure and style
-6. Use proper Verilog syntax and best practices"""
-
-        # Prepare test patterns data for the LLM
-        patterns_str = json.dumps(test_patterns_with_outputs, indent=2)
+        if len(test_patterns_with_outputs) > UPDATE_CHUNK_PATTERNS:
+            return self._llm_update_in_chunks(testbench_code, test_patterns_with_outputs, module_info)
+        response = self.llm_client.generate(**self.build_prompt(testbench_code, test_patterns_with_outputs, module_info))
+        return self.parse_response(response, testbench_code, test_patterns_with_outputs, module_info)
+    
+    def _llm_update_in_chunks(self, testbench_code: str, test_patterns_with_outputs: List[Dict[str, Any]],
+                              module_info: Dict[str, Any]) -> str:
+        """
+        Use parallel LLM requests to write the checks of a testbench with many test cases.
         
-        user_prompt = f"""Given the following Verilog testbench and test patterns with expected outputs,
-update the testbench to include verification logic that checks the actual outputs against the expected outputs.
-
-Original Testbench Code:
-```verilog
-{testbench_code}
-```
-
-Module Information:
-- Module Name: {module_info.get('module_name', 'unknown')}
-- Inputs: {module_info.get('inputs', [])}
-- Outputs: {module_info.get('outputs', [])}
-
-Test Patterns with Expected Outputs:
-```json
-{patterns_str}
-```
-
-Please update the testbench to:
-1. Add integer variables 'passed_tests' and 'failed_tests' at the beginning of the initial block (initialized to 0)
-2. After each test case (identified by $display statements), add a delay (#10) for outputs to settle
-3. For each output signal, compare the actual value against the expected value from the test patterns
-4. Display "✓" for passing checks and "✗" for failing checks with actual and expected values
-5. Increment passed_tests for each passing check and failed_tests for each failing check
-6. At the end of the initial block (before 'end'), add a test summary showing:
-   - Total tests run
-   - Number passed
-   - Number failed
-7. Preserve all original test case displays and structure
-8. Use proper indentation and formatting
-
-Provide ONLY the complete updated testbench code, no explanations.
-Format your response as:
-```verilog
-[updated testbench code here]
-```
-"""
+        Rewriting the whole testbench in one response would be long and slow, so
+        the checks are requested for UPDATE_CHUNK_PATTERNS test cases at a time and
+        inserted after each test case like the rule-based ones. Test cases the
+        responses miss get rule-based checks.
+        
+        Args:
+            testbench_code: Original testbench code
+            test_patterns_with_outputs: Test patterns with golden outputs
+            module_info: Module information
+            
+        Returns:
+            Updated testbench code with verification logic
+        """
+        starts = range(0, len(test_patterns_with_outputs), UPDATE_CHUNK_PATTERNS)
+        requests = [self._checks_prompt(test_patterns_with_outputs, start, module_info) for start in starts]
+        with ThreadPoolExecutor(max_workers=min(_UPDATE_MAX_WORKERS, len(requests))) as executor:
+            responses = list(executor.map(lambda request: self.llm_client.generate(**request), requests))
+        
+        checks = {}
+        for response in responses:
+            for index, code in _CHECK_RE.findall(response):
+                checks[int(index)] = textwrap.dedent(code).strip('\n').split('\n')
+        missing = sum(1 for index, pattern in enumerate(test_patterns_with_outputs)
+                      if pattern.get('expected_outputs') and index not in checks)
+        if missing:
+            print(f"Warning: No LLM checks for {missing} test cases, using rule-based checks for them")
+        return self._add_verification_logic(testbench_code, test_patterns_with_outputs, module_info, checks)
+    
+    def _checks_prompt(self, test_patterns_with_outputs: List[Dict[str, Any]], start: int,
+                       module_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the check request for the test cases from index start on."""
+        chunk = test_patterns_with_outputs[start:start + UPDATE_CHUNK_PATTERNS]
+        # The checks only need the expected outputs, so the inputs are left out of the prompt
+        patterns = [{"test": start + offset, "expected_outputs": pattern.get('expected_outputs')}
+                    for offset, pattern in enumerate(chunk)]
+        user_prompt = _CHECKS_USER_TEMPLATE.format_map({
+            "module_name": module_info.get('module_name', 'unknown'),
+            "outputs": module_info.get('outputs', []),
+            "patterns": json_io.dumps(patterns).decode('utf-8'),
+            "first": start,
+            "last": start + len(chunk) - 1,
+        })
+        return {"prompt": user_prompt, "system_prompt": _CHECKS_SYSTEM_PROMPT, "temperature": 0, "max_tokens": 8000}
+    
+    def build_prompt(self, testbench_code: str, test_patterns_with_outputs: List[Dict[str, Any]],
+                     module_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the testbench update request.
+        
+        Args:
+            testbench_code: Original testbench code
+            test_patterns_with_outputs: Test patterns with golden outputs
+            module_info: Module information
+            
+        Returns:
+            Keyword arguments for LLMClient.generate()
+        """
+        # Prepare test patterns data for the LLM, as compact JSON to keep the prompt short
+        patterns_str = json_io.dumps(test_patterns_with_outputs).decode('utf-8')
+        
+        system_prompt = _UPDATE_SYSTEM_PROMPT
+        user_prompt = _UPDATE_USER_TEMPLATE.format_map({
+            "testbench_code": testbench_code,
+            "module_name": module_info.get('module_name', 'unknown'),
+            "inputs": module_info.get('inputs', []),
+            "outputs": module_info.get('outputs', []),
+            "patterns": patterns_str,
+        })
 
-        response = self.llm_client.generate(user_prompt, system_prompt, max_tokens=8000)
+        return {"prompt": user_prompt, "system_prompt": system_prompt, "temperature": 0, "max_tokens": 8000}
+    
+    def parse_response(self, response: str, testbench_code: str, test_patterns_with_outputs: List[Dict[str, Any]],
+                       module_info: Dict[str, Any]) -> str:
+        """
+        Parse the testbench update response.
         
+        Args:
+            response: LLM response to the request from build_prompt()
+            testbench_code: Original testbench code
+            test_patterns_with_outputs: Test patterns with golden outputs
+            module_info: Module information
+            
+        Returns:
+            Updated testbench code, or the rule-based update if the response is unusable
+        """
         # Extract the Verilog code from the response
         updated_code = self._extract_verilog_code(response)
         
@@ -129,22 +298,19 @@ Format your response as:
             Extracted Verilog code
         """
         # Try to find code between ```verilog and ```
-        if "```verilog" in text:
-            start = text.find("```verilog") + len("```verilog")
-            end = text.find("```", start)
-            if end != -1:
-                return text[start:end].strip()
+        match = _VERILOG_BLOCK_RE.search(text)
+        if match:
+            return match.group(1).strip()
         
         # Try to find code between ``` and ```
-        if "```" in text:
-            parts = text.split("```")
-            if len(parts) >= 3:
-                # Get the first code block
-                code = parts[1].strip()
-                # If it starts with a language identifier, remove it
-                if code.startswith("verilog\n") or code.startswith("verilog "):
-                    code = code.split('\n', 1)[1] if '\n' in code else code
-                return code.strip()
+        match = _CODE_BLOCK_RE.search(text)
+        if match:
+            # Get the first code block
+            code = match.group(1).strip()
+            # If it starts with a language identifier, remove it
+            if code.startswith("verilog\n") or code.startswith("verilog "):
+                code = code.split('\n', 1)[1] if '\n' in code else code
+            return code.strip()
         
         # If no code blocks found, look for module or testbench keywords
         if "module " in text or "initial " in text:
@@ -153,7 +319,8 @@ Format your response as:
         return ""
     
     def _add_verification_logic(self, testbench_code: str, test_patterns: List[Dict[str, Any]], 
-                               module_info: Dict[str, Any]) -> str:
+                               module_info: Dict[str, Any],
+                               checks: Optional[Dict[int, List[str]]] = None) -> str:
         """
         Add verification logic to the testbench.
         
@@ -161,102 +328,92 @@ Format your response as:
             testbench_code: Original testbench code
             test_patterns: Test patterns with expected outputs
             module_info: Module information
+            checks: Unindented check lines by test case index, used instead of the
+                    rule-based checks of those test cases
             
         Returns:
             Testbench code with verification logic added
         """
-        lines = testbench_code.split('\n')
         updated_lines = []
+        # Signal names of the outputs, parsed once for all test cases
+        output_names = tuple(map(_output_name, module_info.get('outputs', [])))
         
         # Track if we're in the initial block
         in_initial = False
-        indent_level = 0
-        test_case_num = 0
+        # Index and expected outputs of each test case, taken in turn by the test case markers
+        test_cases = enumerate(pattern.get('expected_outputs') for pattern in test_patterns)
+        # Start of the first line not yet copied to updated_lines
+        copied = 0
         
-        for i, line in enumerate(lines):
-            stripped = line.strip()
+        # Only lines matching _MARKER_LINE_RE can change the output; the rest are copied as
+        # slices of the testbench that span whole lines, so they join back with '\n'
+        for match in _MARKER_LINE_RE.finditer(testbench_code):
+            line = match.group()
+            marker = match.lastgroup
             
             # Detect initial block
-            if 'initial' in stripped and 'begin' in stripped:
+            if marker == 'initial':
                 in_initial = True
-                updated_lines.append(line)
+                updated_lines.append(testbench_code[copied:match.end()])
                 # Add test result tracking variables after initial begin
-                updated_lines.append("    integer passed_tests = 0;")
-                updated_lines.append("    integer failed_tests = 0;")
-                updated_lines.append("")
+                updated_lines.append(_COUNTER_BLOCK)
+                copied = match.end() + 1
                 continue
             
             # Check for test case markers (e.g., $display for test cases)
-            if in_initial and '$display' in stripped and ('Test' in stripped or 'test' in stripped):
+            if in_initial and marker == 'test':
                 # This is likely a test case display
-                updated_lines.append(line)
+                updated_lines.append(testbench_code[copied:match.end()])
+                copied = match.end() + 1
                 
                 # Add delay to let outputs settle
-                indent = len(line) - len(line.lstrip())
-                indent_str = ' ' * indent
+                indent = _LEADING_SPACE_RE.match(line).end()
+                indent_str = _indent(indent)
                 updated_lines.append(f"{indent_str}#10; // Wait for outputs to settle")
                 
                 # Add verification for this test case if we have expected outputs
-                if test_case_num < len(test_patterns):
-                    pattern = test_patterns[test_case_num]
-                    if 'expected_outputs' in pattern and pattern['expected_outputs']:
+                test_case_num, expected = next(test_cases, (None, None))
+                if expected:
+                    if checks and test_case_num in checks:
+                        updated_lines.extend(indent_str + check if check else check
+                                             for check in checks[test_case_num])
+                    else:
                         verification_lines = self._generate_verification(
-                            pattern, module_info, indent
+                            expected, output_names, indent
                         )
                         updated_lines.extend(verification_lines)
-                    test_case_num += 1
                 continue
             
             # Check for end of initial block
-            if in_initial and (stripped == 'end' or stripped.startswith('end')):
+            if in_initial and marker == 'end':
                 # Add final summary before the end
-                indent = len(line) - len(line.lstrip())
-                indent_str = ' ' * indent
-                updated_lines.append("")
-                updated_lines.append(f"{indent_str}// Test Summary")
-                updated_lines.append(f'{indent_str}$display("\\n========== Test Summary ==========");')
-                updated_lines.append(f'{indent_str}$display("Total Tests: %0d", passed_tests + failed_tests);')
-                updated_lines.append(f'{indent_str}$display("Passed: %0d", passed_tests);')
-                updated_lines.append(f'{indent_str}$display("Failed: %0d", failed_tests);')
-                updated_lines.append(f'{indent_str}$display("==================================\\n");')
-                updated_lines.append("")
-                updated_lines.append(line)
+                if copied < match.start():
+                    updated_lines.append(testbench_code[copied:match.start() - 1])
+                copied = match.start()
+                updated_lines.append(_summary_block(_LEADING_SPACE_RE.match(line).end()))
                 in_initial = False
-                continue
-            
-            updated_lines.append(line)
         
+        if copied <= len(testbench_code):
+            updated_lines.append(testbench_code[copied:])
         return '\n'.join(updated_lines)
     
-    def _generate_verification(self, pattern: Dict[str, Any], module_info: Dict[str, Any], 
+    def _generate_verification(self, expected: Dict[str, Any], output_names: Tuple[str, ...], 
                               indent: int) -> List[str]:
         """
         Generate verification code for a single test pattern.
         
         Args:
-            pattern: Test pattern with expected outputs
-            expected_outputs: Expected output values
-            module_info: Module information
+            expected: Expected output values of the test pattern
+            output_names: Signal names of the module outputs
             indent: Indentation level
             
         Returns:
-            List of verification code lines
+            List of verification code blocks, one multi-line block per checked output
         """
         lines = []
-        indent_str = ' ' * indent
         
-        expected = pattern.get('expected_outputs', {})
-        if not expected:
-            return lines
-        
-        # Get output signals
-        outputs = module_info.get('outputs', [])
-        
-        # Generate verification for each output
-        for output in outputs:
-            output_name = output.split('[')[0].strip()  # Remove bit width if present
-            output_name = output_name.split()[-1]  # Get the signal name
-            
+        # Generate verification for each output, filling in only the expected value
+        for output_name, template in _verification_templates(output_names, indent):
             if output_name in expected:
                 expected_value = expected[output_name]
                 
@@ -264,13 +421,44 @@ Format your response as:
                 if isinstance(expected_value, bool):
                     expected_value = 1 if expected_value else 0
                 
-                # Generate comparison
-                lines.append(f"{indent_str}if ({output_name} === {expected_value}) begin")
-                lines.append(f'{indent_str}    $display("  ✓ {output_name} = %b (expected: {expected_value})", {output_name});')
-                lines.append(f"{indent_str}    passed_tests = passed_tests + 1;")
-                lines.append(f"{indent_str}end else begin")
-                lines.append(f'{indent_str}    $display("  ✗ {output_name} = %b (expected: {expected_value})", {output_name});')
-                lines.append(f"{indent_str}    failed_tests = failed_tests + 1;")
-                lines.append(f"{indent_str}end")
+                lines.append(template.format(expected=expected_value))
+        
+        return lines
+
+
+def _indent(width: int) -> str:
+    """Return an indentation of width spaces (a testbench only uses a few widths)."""
+    indent = _INDENTS.get(width)
+    if indent is None:
+        indent = _INDENTS[width] = ' ' * width
+    return indent
+
+
+@functools.lru_cache(maxsize=None)
+def _summary_block(indent: int) -> str:
+    """Return the test summary at an indentation as one block of lines between empty lines."""
+    return '\n' + '\n'.join(_indent(indent) + summary_line for summary_line in _SUMMARY_LINES) + '\n'
+
+
+@functools.lru_cache(maxsize=None)
+def _verification_templates(output_names: Tuple[str, ...], indent: int) -> Tuple[Tuple[str, str], ...]:
+    """
+    Prepare the check of each output signal at an indentation, once for all test patterns.
+    
+    Args:
+        output_names: Signal names of the module outputs
+        indent: Indentation level
         
-        return lines
\ No newline at end of file
+    Returns:
+        (signal name, check with an {expected} placeholder) per output
+    """
+    return tuple(
+        (name, _VERIFICATION_TEMPLATE.format(indent=_indent(indent), name=name, expected='{expected}'))
+        for name in output_names
+    )
+
+
+def _output_name(output: str) -> str:
+    """Return the signal name of an output declaration such as "reg [7:0] y"."""
+    output_name = output.split(']')[-1]  # Remove type and bit width if present
+    return output_name.split()[-1]  # Get the signal name
\ No newline at end of file
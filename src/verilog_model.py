@@ -0,0 +1,418 @@
+"""
+Derive Python golden models directly from purely combinational Verilog.
+
+Modules made only of port/wire declarations and continuous assignments
+(`assign <net> = <expr>;`) are translated into an equivalent Python function,
+so Step 4 does not need an LLM round-trip for them.
+
+Note that such a model mirrors the RTL rather than the natural language
+description, so it verifies the testbench flow but not the design intent.
+"""
+
+import re
+import keyword
+from typing import Dict, List, Optional, Tuple
+
+
+_COMMENT_RE = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+_MODULE_RE = re.compile(r"^\s*module\s+(\w+)\s*\((.*?)\)\s*;(.*?)\bendmodule\s*$", re.DOTALL)
+_PORT_RE = re.compile(r"^(input|output)\s+(?:wire\s+)?(?:\[\s*(\d+)\s*:\s*(\d+)\s*\]\s*)?(\w+)$")
+_DECL_RE = re.compile(r"^(input|output|wire)\s+(?:wire\s+)?(?:\[\s*(\d+)\s*:\s*(\d+)\s*\]\s*)?(\w+(?:\s*,\s*\w+)*)$")
+_ASSIGN_RE = re.compile(r"^assign\s+(\w+)\s*=\s*(.+)$", re.DOTALL)
+_IDENT_RE = re.compile(r"^[A-Za-z_]\w*$")
+_SPACE_RE = re.compile(r"\s")
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<sized>\d*\s*'\s*[bBoOdDhH]\s*[0-9a-fA-F_]+)
+      | (?P<number>\d[\d_]*)
+      | (?P<ident>[A-Za-z_]\w*)
+      | (?P<op>===|!==|<<<|>>>|~\^|\^~|\*\*|==|!=|<=|>=|<<|>>|&&|\|\||[-+*/%&|^~!?:()\[\]{},<>])
+    )""", re.VERBOSE)
+
+_BASES = {'b': 2, 'o': 8, 'd': 10, 'h': 16}
+
+# Binary operators by Verilog precedence, loosest first
+_BINARY_LEVELS = [
+    ('||',),
+    ('&&',),
+    ('|',),
+    ('^',),
+    ('&',),
+    ('==', '!='),
+    ('<', '<=', '>', '>='),
+    ('<<', '>>'),
+    ('+', '-'),
+    ('*',),
+]
+
+_CONTEXT_OPS = ('+', '-', '*', '&', '|', '^')
+_COMPARE_OPS = ('==', '!=', '<', '<=', '>', '>=')
+
+
+def synthesize_golden_model(verilog_code: str, module_name: str) -> Optional[str]:
+    """
+    Translate a module of continuous assignments into a Python golden model.
+
+    Args:
+        verilog_code: Verilog module code
+        module_name: Expected module name (the function is named <module_name>_golden)
+
+    Returns:
+        Python code defining <module_name>_golden, or None if the module uses
+        anything beyond declarations and simple continuous assignments
+    """
+    try:
+        module = _parse_module(verilog_code)
+    except ValueError:
+        return None
+    if module is None or module[0] != module_name:
+        return None
+    _, inputs, outputs, widths, assigns = module
+
+    try:
+        order = _assignment_order(inputs, outputs, assigns)
+        lines = []
+        for target in order:
+            expr = _Parser(assigns[target], widths).parse()
+            code, bound = _emit(expr, max(_width(expr, widths), widths[target]), widths)
+            if bound > widths[target]:
+                code = f"({code} & {_mask(widths[target])})"
+            lines.append(f"    {target} = {code}")
+    except ValueError:
+        return None
+
+    # Step 3 patterns give input values as binary strings
+    parses = [f"    {name} = int({name}, 2) if isinstance({name}, str) else {name}" for name in inputs]
+    returned = ', '.join(f"'{name}': {name}" for name in outputs)
+    return (f"def {module_name}_golden({', '.join(inputs)}):\n"
+            f"    \"\"\"Golden model derived from the continuous assignments of {module_name}.\"\"\"\n"
+            + '\n'.join(parses + lines) + '\n'
+            f"    return {{{returned}}}\n")
+
+
+def _parse_module(verilog_code: str):
+    """
+    Parse a module into ports, net widths and continuous assignments.
+
+    Returns:
+        Tuple of (module name, input names, output names, widths, assignments),
+        or None if the module is not purely combinational assignments
+
+    Raises:
+        ValueError: If the module declares unsupported constructs
+    """
+    match = _MODULE_RE.match(_COMMENT_RE.sub('', verilog_code))
+    if not match:
+        return None
+    module_name, header, body = match.groups()
+
+    inputs, outputs, widths = [], [], {}
+
+    def declare(direction, msb, lsb, name):
+        if not _IDENT_RE.match(name) or keyword.iskeyword(name) or name in ('input', 'output', 'wire'):
+            raise ValueError(f"unsupported net name: {name}")
+        if lsb is not None and (int(lsb) != 0 or int(msb) < 0):
+            raise ValueError("only [N:0] ranges are supported")
+        widths[name] = int(msb) + 1 if msb is not None else 1
+        if direction == 'input':
+            inputs.append(name)
+        elif direction == 'output':
+            outputs.append(name)
+
+    # ANSI headers declare ports inline; later names inherit the last direction
+    current = None
+    for item in (part.strip() for part in header.split(',')):
+        if not item:
+            continue
+        port = _PORT_RE.match(item)
+        if port:
+            current = port.groups()[:3]
+            declare(*current, port.group(4))
+        elif _IDENT_RE.match(item) and current is not None:
+            declare(*current, item)
+        elif not _IDENT_RE.match(item):
+            raise ValueError(f"unsupported port declaration: {item}")
+
+    assigns = {}
+    for statement in (part.strip() for part in body.split(';')):
+        if not statement:
+            continue
+        decl = _DECL_RE.match(statement)
+        assign = _ASSIGN_RE.match(statement)
+        if decl:
+            direction, msb, lsb, names = decl.groups()
+            for name in names.split(','):
+                declare(direction, msb, lsb, name.strip())
+        elif assign:
+            target, expr = assign.groups()
+            if target in assigns:
+                raise ValueError(f"multiple drivers for {target}")
+            assigns[target] = expr
+        else:
+            return None
+
+    return module_name, inputs, outputs, widths, assigns
+
+
+def _assignment_order(inputs: List[str], outputs: List[str], assigns: Dict[str, str]) -> List[str]:
+    """
+    Order continuous assignments so every net is computed before it is read.
+
+    Raises:
+        ValueError: If an output is undriven, a net is unknown, or nets form a loop
+    """
+    if not outputs or any(name not in assigns for name in outputs):
+        raise ValueError("every output needs a continuous assignment")
+
+    reads = {target: {value for kind, value in _Parser._tokenize(expr) if kind == 'ident'}
+             for target, expr in assigns.items()}
+    order, done, visiting = [], set(inputs), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name not in assigns or name in visiting:
+            raise ValueError(f"undriven or combinational loop at {name}")
+        visiting.add(name)
+        for dependency in reads[name]:
+            visit(dependency)
+        visiting.discard(name)
+        done.add(name)
+        order.append(name)
+
+    for name in assigns:
+        visit(name)
+    return order
+
+
+class _Parser:
+    """Recursive-descent parser for Verilog expressions."""
+
+    def __init__(self, text: str, widths: Dict[str, int]):
+        self.tokens = self._tokenize(text)
+        self.pos = 0
+        self.widths = widths
+
+    @staticmethod
+    def _tokenize(text: str) -> List[Tuple[str, str]]:
+        tokens, pos, text = [], 0, text.rstrip()
+        while pos < len(text):
+            match = _TOKEN_RE.match(text, pos)
+            if not match or match.end() == pos:
+                raise ValueError(f"unexpected character in expression: {text[pos:]!r}")
+            kind = match.lastgroup
+            tokens.append((kind, match.group(kind)))
+            pos = match.end()
+        return tokens
+
+    def parse(self):
+        node = self._ternary()
+        if self.pos != len(self.tokens):
+            raise ValueError("trailing tokens in expression")
+        return node
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.pos][1] if self.pos < len(self.tokens) else None
+
+    def _take(self, expected: Optional[str] = None) -> Tuple[str, str]:
+        if self.pos >= len(self.tokens):
+            raise ValueError("unexpected end of expression")
+        token = self.tokens[self.pos]
+        if expected is not None and token[1] != expected:
+            raise ValueError(f"expected {expected!r}, got {token[1]!r}")
+        self.pos += 1
+        return token
+
+    def _ternary(self):
+        cond = self._binary(0)
+        if self._peek() != '?':
+            return cond
+        self._take('?')
+        then = self._ternary()
+        self._take(':')
+        return ('?:', cond, then, self._ternary())
+
+    def _binary(self, level: int):
+        if level == len(_BINARY_LEVELS):
+            return self._unary()
+        node = self._binary(level + 1)
+        while self._peek() in _BINARY_LEVELS[level]:
+            op = self._take()[1]
+            node = (op, node, self._binary(level + 1))
+        return node
+
+    def _unary(self):
+        if self._peek() in ('~', '!', '-', '+'):
+            op = self._take()[1]
+            return ('u' + op, self._unary())
+        return self._primary()
+
+    def _primary(self):
+        kind, value = self._take()
+        if value == '(':
+            node = self._ternary()
+            self._take(')')
+            return node
+        if value == '{':
+            return self._concat()
+        if kind == 'number':
+            return ('const', int(value.replace('_', '')), 32)
+        if kind == 'sized':
+            return self._sized(value)
+        if kind == 'ident':
+            if value not in self.widths:
+                raise ValueError(f"undeclared net {value}")
+            if self._peek() == '[':
+                return self._select(value)
+            return ('id', value)
+        raise ValueError(f"unsupported token {value!r}")
+
+    def _sized(self, literal: str):
+        size, digits = _SPACE_RE.sub('', literal).split("'")
+        value = int(digits[1:].replace('_', ''), _BASES[digits[0].lower()])
+        width = int(size) if size else 32
+        if width == 0:
+            raise ValueError("zero-width literal")
+        return ('const', value & ((1 << width) - 1), width)
+
+    def _select(self, name: str):
+        self._take('[')
+        msb = self._take()
+        if msb[0] != 'number':
+            raise ValueError("only constant bit/part selects are supported")
+        if self._peek() == ':':
+            self._take(':')
+            lsb = self._take()
+            if lsb[0] != 'number':
+                raise ValueError("only constant bit/part selects are supported")
+            self._take(']')
+            high, low = int(msb[1]), int(lsb[1])
+            if high < low:
+                raise ValueError("descending part select required")
+            return ('select', name, high, low)
+        self._take(']')
+        return ('select', name, int(msb[1]), int(msb[1]))
+
+    def _concat(self):
+        first = self._ternary()
+        if self._peek() == '{':
+            # Replication: {N{expr}}
+            if first[0] != 'const':
+                raise ValueError("replication count must be constant")
+            self._take('{')
+            inner = self._concat()
+            self._take('}')
+            return ('repl', first[1], inner)
+        parts = [first]
+        while self._peek() == ',':
+            self._take(',')
+            parts.append(self._ternary())
+        self._take('}')
+        return ('concat', parts)
+
+
+def _mask(width: int) -> str:
+    """Return the all-ones mask of a bit width as a hex literal."""
+    return hex((1 << width) - 1)
+
+
+def _width(node, widths: Dict[str, int]) -> int:
+    """Return the self-determined bit width of an expression."""
+    kind = node[0]
+    if kind == 'const':
+        return node[2]
+    if kind == 'id':
+        return widths[node[1]]
+    if kind == 'select':
+        return node[2] - node[3] + 1
+    if kind == 'concat':
+        return sum(_width(part, widths) for part in node[1])
+    if kind == 'repl':
+        return node[1] * _width(node[2], widths)
+    if kind in ('u~', 'u-', 'u+'):
+        return _width(node[1], widths)
+    if kind == 'u!' or kind in _COMPARE_OPS or kind in ('&&', '||'):
+        return 1
+    if kind in ('<<', '>>'):
+        return _width(node[1], widths)
+    if kind == '?:':
+        return max(_width(node[2], widths), _width(node[3], widths))
+    return max(_width(node[1], widths), _width(node[2], widths))
+
+
+def _emit(node, context: int, widths: Dict[str, int]) -> Tuple[str, int]:
+    """
+    Emit Python source for an expression evaluated at a context width.
+
+    Operations that can overflow or go negative are masked to the context
+    width, matching Verilog's sized arithmetic.
+
+    Returns:
+        Tuple of (Python expression, upper bound on the result's bit width)
+    """
+    kind = node[0]
+    if kind == 'const':
+        return str(node[1]), node[1].bit_length()
+    if kind == 'id':
+        return node[1], widths[node[1]]
+    if kind == 'select':
+        _, name, high, low = node
+        width = high - low + 1
+        return f"(({name} >> {low}) & {_mask(width)})", width
+    if kind == 'concat':
+        codes, shift = [], sum(_width(part, widths) for part in node[1])
+        for part in node[1]:
+            part_width = _width(part, widths)
+            shift -= part_width
+            code, _ = _emit(part, part_width, widths)
+            codes.append(f"({code} << {shift})" if shift else code)
+        return f"({' | '.join(codes)})", _width(node, widths)
+    if kind == 'repl':
+        count, inner = node[1], node[2]
+        inner_width = _width(inner, widths)
+        factor = sum(1 << (i * inner_width) for i in range(count))
+        code, _ = _emit(inner, inner_width, widths)
+        return f"({code} * {hex(factor)})", count * inner_width
+    if kind == 'u~':
+        code, _ = _emit(node[1], context, widths)
+        return f"(~{code} & {_mask(context)})", context
+    if kind == 'u-':
+        code, _ = _emit(node[1], context, widths)
+        return f"(-{code} & {_mask(context)})", context
+    if kind == 'u+':
+        return _emit(node[1], context, widths)
+    if kind == 'u!':
+        code, _ = _emit(node[1], _width(node[1], widths), widths)
+        return f"(1 if {code} == 0 else 0)", 1
+    if kind in ('&&', '||'):
+        left, _ = _emit(node[1], _width(node[1], widths), widths)
+        right, _ = _emit(node[2], _width(node[2], widths), widths)
+        op = '&' if kind == '&&' else '|'
+        return f"((1 if {left} else 0) {op} (1 if {right} else 0))", 1
+    if kind in _COMPARE_OPS:
+        operand_width = max(_width(node[1], widths), _width(node[2], widths))
+        left, _ = _emit(node[1], operand_width, widths)
+        right, _ = _emit(node[2], operand_width, widths)
+        return f"(1 if {left} {kind} {right} else 0)", 1
+    if kind == '?:':
+        cond, _ = _emit(node[1], _width(node[1], widths), widths)
+        then, then_bound = _emit(node[2], context, widths)
+        other, other_bound = _emit(node[3], context, widths)
+        return f"({then} if {cond} else {other})", max(then_bound, other_bound)
+    if kind == '>>':
+        left, bound = _emit(node[1], context, widths)
+        right, _ = _emit(node[2], _width(node[2], widths), widths)
+        return f"({left} >> {right})", bound
+    if kind == '<<':
+        left, _ = _emit(node[1], context, widths)
+        right, _ = _emit(node[2], _width(node[2], widths), widths)
+        return f"(({left} << {right}) & {_mask(context)})", context
+    if kind in _CONTEXT_OPS:
+        left, left_bound = _emit(node[1], context, widths)
+        right, right_bound = _emit(node[2], context, widths)
+        if kind == '&':
+            return f"({left} & {right})", min(left_bound, right_bound)
+        if kind in ('|', '^'):
+            return f"({left} {kind} {right})", max(left_bound, right_bound)
+        return f"(({left} {kind} {right}) & {_mask(context)})", context
+    raise ValueError(f"unsupported operator {kind}")
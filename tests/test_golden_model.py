@@ -10,16 +10,19 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from src.golden_model_generator import GoldenModelGenerator
+from src import golden_model_generator
+from src import golden_runner
 from src.llm_client import LLMClient
 
 
 class TestGoldenModel(unittest.TestCase):
     """Test Python golden model generation and execution."""
     
-    def setUp(self):
-        """Set up test fixtures."""
-        self.llm_client = LLMClient()
-        self.golden_gen = GoldenModelGenerator(self.llm_client)
+    @classmethod
+    def setUpClass(cls):
+        """Set up test fixtures shared by all tests (none of them change the client)."""
+        cls.llm_client = LLMClient()
+        cls.golden_gen = GoldenModelGenerator(cls.llm_client)
     
     def test_python_code_extraction_with_markers(self):
         """Test extraction of Python code from LLM response with markers."""
@@ -71,6 +74,21 @@ This implements the 2-to-1 mux."""
         if results[1].get('expected_outputs'):
             self.assertEqual(results[1]['expected_outputs']['sum'], 7)
     
+    def test_compute_golden_outputs_in_place(self):
+        """Test that in-place evaluation adds outputs to the given patterns and copies otherwise."""
+        python_code = """def test_golden(a, b):
+    return {'sum': a + b}"""
+        
+        test_patterns = [{'a': 1, 'b': 2}]
+        module_info = {'module_name': 'test'}
+        
+        results = self.golden_gen.compute_golden_outputs(python_code, test_patterns, module_info)
+        self.assertNotIn('expected_outputs', test_patterns[0])
+        
+        results = self.golden_gen.compute_golden_outputs(python_code, test_patterns, module_info, in_place=True)
+        self.assertIs(results[0], test_patterns[0])
+        self.assertEqual(test_patterns[0]['expected_outputs'], {'sum': 3})
+    
     def test_compute_golden_outputs_error_handling(self):
         """Test error handling when golden model execution fails."""
         python_code = """def test_golden(a, b):
@@ -90,6 +108,161 @@ This implements the 2-to-1 mux."""
         # Should have error recorded
         self.assertIn('error', results[0].keys())
 
+    def test_malformed_model_rejected_before_exec(self):
+        """Test that code without the golden function or with a syntax error is never executed."""
+        module_info = {'module_name': 'test'}
+        test_patterns = [{'a': 1}]
+        python_code = "import sys\nsys.modules['_golden_probe'] = sys\ndef other_golden(a):\n    return {'y': a}"
+        
+        self.assertEqual(self.golden_gen.compute_golden_outputs(python_code, test_patterns, module_info), [])
+        self.assertNotIn('_golden_probe', sys.modules)
+        self.assertEqual(self.golden_gen.compute_golden_outputs("def test_golden(a):\n    return {", test_patterns,
+                                                                module_info), [])
+    
+    def test_compute_golden_outputs_memoizes_repeated_inputs(self):
+        """Test that repeated input vectors reach a pure golden model once."""
+        python_code = """def test_golden(a, b):
+    outputs = {}
+    outputs['sum'] = a + b
+    return outputs"""
+
+        test_patterns = [{'inputs': {'a': 1, 'b': 2}}, {'inputs': {'b': 2, 'a': 1}},
+                         {'inputs': {'a': 3, 'b': 4}}]
+
+        self.assertTrue(golden_model_generator._is_deterministic(python_code))
+        results = self.golden_gen.compute_golden_outputs(
+            python_code, test_patterns, {'module_name': 'test'}
+        )
+
+        self.assertEqual([r['expected_outputs'] for r in results], [{'sum': 3}, {'sum': 3}, {'sum': 7}])
+        # Results are copies of the cached entry
+        self.assertIsNot(results[0]['expected_outputs'], results[1]['expected_outputs'])
+
+    def test_compute_golden_outputs_stateful_model_not_memoized(self):
+        """Test that a model keeping state is called for every pattern."""
+        python_code = """CALLS = []
+def test_golden(a, b):
+    CALLS.append((a, b))
+    return {'sum': a + b, 'call': len(CALLS)}"""
+
+        test_patterns = [{'inputs': {'a': 1, 'b': 2}}, {'inputs': {'b': 2, 'a': 1}},
+                         {'inputs': {'a': 3, 'b': 4}}]
+
+        results = self.golden_gen.compute_golden_outputs(
+            python_code, test_patterns, {'module_name': 'test'}
+        )
+
+        self.assertEqual([r['expected_outputs']['call'] for r in results], [1, 2, 3])
+        for body in ("import random\ndef f(a):\n    return {'y': a + random.randint(0, 0)}",
+                     "def f(a, seen=[]):\n    seen.append(a)\n    return {'y': len(seen)}",
+                     "def f(a):\n    f.calls = getattr(f, 'calls', 0) + 1\n    return {'y': f.calls}",
+                     "def f(a):\n    global n\n    n = a\n    return {'y': n}"):
+            self.assertFalse(golden_model_generator._is_deterministic(body), body)
+
+    def test_compute_golden_outputs_parallel_matches_serial(self):
+        """Test that worker-process evaluation agrees with the serial loop."""
+        # str() keeps the model out of the compiled batch path
+        python_code = """def test_golden(a, b):
+    if a == 7:
+        raise ValueError("seven")
+    return {'y': int(str(a)) * b}"""
+
+        test_patterns = [{'a': a, 'b': b} for a in range(20) for b in range(20)]
+        module_info = {'module_name': 'test'}
+
+        parallel_gen = GoldenModelGenerator(self.llm_client, parallel=True)
+        results = parallel_gen.compute_golden_outputs(python_code, test_patterns, module_info)
+
+        self.assertEqual(results, self.golden_gen.compute_golden_outputs(python_code, test_patterns, module_info))
+        self.assertEqual(results[7 * 20]['error'], 'seven')
+
+    @unittest.skipIf(golden_runner.njit is None, "numba not installed")
+    def test_compute_golden_outputs_batch_matches_scalar(self):
+        """Test that the compiled batch path agrees with the Python model."""
+        python_code = """def adder4bit_golden(a, b):
+    result = a + b
+    return {'sum': result & 0xF, 'carry': (result >> 4) & 1}"""
+        
+        test_patterns = [{'a': a, 'b': b} for a in range(16) for b in range(16)]
+        module_info = {'module_name': 'adder4bit'}
+        
+        results = self.golden_gen.compute_golden_outputs(
+            python_code, test_patterns, module_info
+        )
+        
+        self.assertEqual(len(results), 256)
+        for result in results:
+            total = result['a'] + result['b']
+            self.assertEqual(result['expected_outputs'], {'sum': total & 0xF, 'carry': total >> 4})
+    
+    @unittest.skipIf(golden_runner.njit is None, "numba not installed")
+    def test_batch_handles_branching_model(self):
+        """Test that models with control flow are compiled and agree with Python."""
+        python_code = """def mux2to1_golden(a, b, sel):
+    if sel == 0:
+        return {'y': a, 'n': 0}
+    return {'n': 1, 'y': b}"""
+        
+        test_patterns = [{'a': a, 'b': b, 'sel': i % 2} for i, (a, b) in
+                         enumerate((a, b) for a in range(16) for b in range(16))]
+        
+        results = golden_runner.run_batch(python_code, 'mux2to1_golden', test_patterns)
+        
+        self.assertEqual(results, [{'y': p['b'] if p['sel'] else p['a'], 'n': p['sel']} for p in test_patterns])
+    
+    @unittest.skipIf(golden_runner.njit is None, "numba not installed")
+    def test_batch_falls_back_on_int64_overflow(self):
+        """Test that a kernel result that wraps in int64 is not used."""
+        python_code = """def mul32_golden(a, b):
+    return {'p': a * b}"""
+        
+        test_patterns = [{'a': 0xFFFFFFFF - i, 'b': 0xFFFFFFFF} for i in range(300)]
+        
+        self.assertIsNone(golden_runner.run_batch(python_code, 'mul32_golden', test_patterns))
+        results = self.golden_gen.compute_golden_outputs(python_code, test_patterns, {'module_name': 'mul32'})
+        self.assertEqual(results[0]['expected_outputs'], {'p': 18446744065119617025})
+    
+    @unittest.skipIf(golden_runner.njit is None, "numba not installed")
+    def test_batch_keeps_bool_outputs(self):
+        """Test that comparison outputs come back as bools, as in Python."""
+        python_code = """def cmp_golden(a, b):
+    return {'eq': a == b, 'diff': a - b}"""
+        
+        test_patterns = [{'a': a, 'b': b} for a in range(16) for b in range(16)]
+        
+        results = golden_runner.run_batch(python_code, 'cmp_golden', test_patterns)
+        
+        self.assertEqual(results, [{'eq': p['a'] == p['b'], 'diff': p['a'] - p['b']} for p in test_patterns])
+        self.assertIs(results[0]['eq'], True)
+    
+    @unittest.skipIf(golden_runner.np is None, "numpy not installed")
+    def test_vectorized_evaluation(self):
+        """Test that branch-free models outside the compiled subset are evaluated on NumPy arrays."""
+        python_code = """def parity2(x):
+    return (x ^ (x >> 1)) & 1
+
+def pgen_golden(a, b):
+    return {'p': parity2(a) & b, 'eq': a == b, 'one': 1}"""
+        
+        test_patterns = [{'a': a, 'b': b} for a in range(16) for b in range(16)]
+        
+        self.assertIsNone(golden_runner._analyze(python_code, 'pgen_golden'))
+        results = golden_runner.run_vectorized(python_code, 'pgen_golden', test_patterns)
+        
+        self.assertEqual(results, [{'p': ((p['a'] ^ (p['a'] >> 1)) & 1) & p['b'], 'eq': p['a'] == p['b'], 'one': 1}
+                                   for p in test_patterns])
+        self.assertIs(results[0]['eq'], True)
+        
+        branching_code = "def f_golden(a, b):\n    if a > b:\n        return {'y': a}\n    return {'y': b}"
+        self.assertIsNone(golden_runner.run_vectorized(branching_code, 'f_golden', test_patterns))
+    
+    def test_batch_rejects_unsupported_model(self):
+        """Test that models using imports, attributes or other calls are left to the per-pattern loop."""
+        for body in ("import math\n    return {'y': a}",
+                     "return {'y': a.bit_length()}",
+                     "return {'y': len(str(a))}"):
+            python_code = f"def f_golden(a):\n    {body}"
+            self.assertIsNone(golden_runner._analyze(python_code, 'f_golden'))
 
 if __name__ == '__main__':
     unittest.main()
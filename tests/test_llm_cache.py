@@ -0,0 +1,91 @@
+"""
+Test the on-disk LLM response cache
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.llm_cache import LLMCache
+
+
+class TestLLMCache(unittest.TestCase):
+    """Test LLM response caching."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = LLMCache(cache_dir=self.temp_dir)
+        self.messages = [{"role": "user", "content": "Generate a testbench"}]
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def test_key_is_deterministic(self):
+        """Test that identical requests map to the same key."""
+        key1 = self.cache.cache_key("gpt-4", self.messages, 0)
+        key2 = self.cache.cache_key("gpt-4", list(self.messages), 0)
+
+        self.assertIsNotNone(key1)
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, self.cache.cache_key("gpt-4o", self.messages, 0))
+
+    def test_nonzero_temperature_not_cached(self):
+        """Test that sampled requests are never cached."""
+        self.assertIsNone(self.cache.cache_key("gpt-4", self.messages, 0.7))
+
+    def test_seed_and_request_options(self):
+        """Test that seeded requests are cached and request options are part of the key."""
+        key = self.cache.cache_key("gpt-4", self.messages, 0.7, seed=42)
+
+        self.assertIsNotNone(key)
+        self.assertNotEqual(key, self.cache.cache_key("gpt-4", self.messages, 0.7, seed=43))
+        self.assertNotEqual(self.cache.cache_key("gpt-4", self.messages, 0, max_tokens=4000),
+                            self.cache.cache_key("gpt-4", self.messages, 0, max_tokens=8000))
+
+    def test_disabled_cache(self):
+        """Test that a disabled cache never produces keys."""
+        cache = LLMCache(cache_dir=self.temp_dir, enabled=False)
+
+        self.assertIsNone(cache.cache_key("gpt-4", self.messages, 0))
+
+    def test_set_and_get(self):
+        """Test storing and retrieving a response."""
+        key = self.cache.cache_key("gpt-4", self.messages, 0)
+
+        self.assertIsNone(self.cache.get(key))
+        self.cache.set(key, "module tb; endmodule")
+        self.assertEqual(self.cache.get(key), "module tb; endmodule")
+        self.assertEqual(self.cache.stats, {"hits": 1, "misses": 1})
+
+    def test_expired_entry_is_a_miss(self):
+        """Test that entries older than the TTL are ignored."""
+        cache = LLMCache(cache_dir=self.temp_dir, ttl=-1)
+        key = cache.cache_key("gpt-4", self.messages, 0)
+        cache.set(key, "stale")
+
+        self.assertIsNone(cache.get(key))
+
+    def test_memory_layer(self):
+        """Test that recent responses are served from memory and entries are written whole."""
+        key = self.cache.cache_key("gpt-4", self.messages, 0)
+        self.cache.set(key, "module tb; endmodule")
+        self.assertEqual(os.listdir(self.temp_dir), [f"{key}.json"])
+
+        os.remove(os.path.join(self.temp_dir, f"{key}.json"))
+        self.assertEqual(self.cache.get(key), "module tb; endmodule")
+
+        # Another process (a fresh cache) reads the entry from disk
+        self.cache.set(key, "module tb2; endmodule")
+        self.assertEqual(LLMCache(cache_dir=self.temp_dir).get(key), "module tb2; endmodule")
+
+
+if __name__ == '__main__':
+    unittest.main()
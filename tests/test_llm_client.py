@@ -0,0 +1,97 @@
+"""
+Test request handling of the LLM client
+"""
+
+import unittest
+import sys
+import os
+import json
+import tempfile
+import shutil
+from types import SimpleNamespace
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.llm_client import LLMClient
+from src.llm_cache import LLMCache
+
+
+class FakeBatchAPI:
+    """Offline stand-in for the files and batches endpoints of the OpenAI client."""
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.submitted = []
+        self.files = SimpleNamespace(create=self._create_file, content=self._content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve)
+
+    def _create_file(self, file, purpose):
+        self.submitted = [json.loads(line) for line in file[1].decode('utf-8').splitlines()]
+        return SimpleNamespace(id="file-in")
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        return SimpleNamespace(id="batch-1", status="in_progress", output_file_id=None)
+
+    def _retrieve(self, batch_id):
+        return SimpleNamespace(id=batch_id, status="completed", output_file_id="file-out")
+
+    def _content(self, file_id):
+        lines = []
+        for line in self.submitted:
+            outcome = self.outcomes[line["custom_id"]]
+            if outcome is None:
+                continue
+            if isinstance(outcome, int):
+                response = {"status_code": outcome, "body": {"error": "rate limited"}}
+            else:
+                response = {"status_code": 200, "body": {"choices": [{"message": {"content": outcome}}]}}
+            lines.append(json.dumps({"custom_id": line["custom_id"], "response": response}))
+        return SimpleNamespace(text="\n".join(lines))
+
+
+class TestLLMClient(unittest.TestCase):
+    """Test the Batch API mode of the LLM client."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.llm_client = LLMClient(api_key=None, cache=LLMCache(cache_dir=self.temp_dir), seed=7)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def test_generate_batch(self):
+        """Test that batch results, failures and missing lines map back to their request IDs."""
+        api = FakeBatchAPI({"ok": "module tb;", "failed": 429, "lost": None})
+        self.llm_client.client = api
+        requests = {name: {"prompt": name, "system_prompt": "sys", "response_format": {"type": "json_object"}}
+                    for name in ("ok", "failed", "lost")}
+
+        results = self.llm_client.generate_batch(requests, poll_interval=0)
+
+        self.assertEqual(results["ok"], "module tb;")
+        self.assertTrue(results["failed"].startswith("Error:"))
+        self.assertEqual(results["lost"], "Error: batch batch-1 completed without a result")
+        body = api.submitted[0]["body"]
+        self.assertEqual(body["seed"], 7)
+        self.assertEqual(body["response_format"], {"type": "json_object"})
+
+        # Only the successful response was cached, so a repeat submits the other two again
+        results = self.llm_client.generate_batch(requests, poll_interval=0)
+        self.assertEqual(results["ok"], "module tb;")
+        self.assertEqual([line["custom_id"] for line in api.submitted], ["failed", "lost"])
+
+    def test_generate_batch_all_cached(self):
+        """Test that a fully cached batch never reaches the API."""
+        self.llm_client.client = FakeBatchAPI({"ok": "module tb;"})
+        self.llm_client.generate_batch({"ok": {"prompt": "ok"}}, poll_interval=0)
+
+        self.llm_client.client = None
+        self.assertEqual(self.llm_client.generate_batch({"ok": {"prompt": "ok"}}), {"ok": "module tb;"})
+
+
+if __name__ == '__main__':
+    unittest.main()
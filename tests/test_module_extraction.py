@@ -16,10 +16,11 @@ from src.llm_client import LLMClient
 class TestModuleExtraction(unittest.TestCase):
     """Test Verilog module information extraction."""
     
-    def setUp(self):
-        """Set up test fixtures."""
-        self.llm_client = LLMClient()
-        self.tb_gen = TestbenchGenerator(self.llm_client)
+    @classmethod
+    def setUpClass(cls):
+        """Set up test fixtures shared by all tests (none of them change the client)."""
+        cls.llm_client = LLMClient()
+        cls.tb_gen = TestbenchGenerator(cls.llm_client)
     
     def test_simple_mux_extraction(self):
         """Test extraction of simple 2-to-1 mux module info."""
@@ -67,6 +68,53 @@ endmodule"""
         self.assertEqual(module_info['module_name'], '')
         self.assertEqual(len(module_info['inputs']), 0)
         self.assertEqual(len(module_info['outputs']), 0)
+    
+    def test_multi_name_declarations(self):
+        """Test non-ANSI port lists, multi-name declarations and comments."""
+        verilog_code = """module mux2to1 (a, b, sel, y);
+    input wire a, b, sel;  // input_reg is not a port
+    /* output wire z; */
+    output reg [1:0] y;
+endmodule"""
+        
+        module_info = self.tb_gen._extract_module_info(verilog_code)
+        
+        self.assertEqual(module_info['module_name'], 'mux2to1')
+        self.assertEqual(module_info['inputs'], ['wire a', 'wire b', 'wire sel'])
+        self.assertEqual(module_info['outputs'], ['reg [1:0] y'])
+    
+    def test_parse_response_with_annotated_markers(self):
+        """Test that section markers followed by a format note are still found."""
+        response = """TESTBENCH_CODE:
+```verilog
+module tb; endmodule
+```
+
+TEST_PATTERNS (a list of dictionaries. Each dictionary contains only input signal names):
+```json
+[{"a": "0"}, {"a": "1"}]
+```"""
+        
+        result = self.tb_gen.parse_response(response, "module inv(input a, output y); endmodule")
+        
+        self.assertEqual(result['testbench_code'], 'module tb; endmodule')
+        self.assertEqual(result['test_patterns'], [{'a': '0'}, {'a': '1'}])
+    
+    def test_parse_response_keeps_wide_integers(self):
+        """Test that integer patterns wider than 64 bits are not turned into floats."""
+        response = """TESTBENCH_CODE:
+```verilog
+module tb; endmodule
+```
+
+TEST_PATTERNS:
+```json
+[{"a": 123456789012345678901234567890}]
+```"""
+        
+        result = self.tb_gen.parse_response(response, "module inv(input [99:0] a, output [99:0] y); endmodule")
+        
+        self.assertEqual(result['test_patterns'], [{'a': 123456789012345678901234567890}])
 
 
 if __name__ == '__main__':
@@ -3,15 +3,96 @@ Integration test for the complete pipeline
 """
 
 import unittest
+import asyncio
+import json
 import sys
 import os
 import tempfile
 import shutil
+import subprocess
+from unittest import mock
 
 # Add parent directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from src.testbench_pipeline import TestbenchPipeline
+from src.testbench_pipeline import TestbenchPipeline, _PatternWriter
+from src import golden_model_generator, golden_runner, simulator
+from src import json_io
+
+
+VERILOG_AND = """module and_gate (
+    input wire a,
+    input wire b,
+    output wire y
+);
+    assign y = a & b;
+endmodule"""
+
+TESTBENCH = """module tb;
+reg a, b; wire y;
+and_gate dut (.a(a), .b(b), .y(y));
+initial begin
+  a = 0; b = 1; #10;
+  $display("Test 1: a=%b b=%b", a, b);
+  $finish;
+end
+endmodule"""
+
+
+class FakeLLMClient:
+    """Offline stand-in for LLMClient that answers each pipeline step with a canned response."""
+    
+    def __init__(self, patterns, golden_code, delay=0.0):
+        self.testbench_response = ("TESTBENCH_CODE:\n```verilog\n" + TESTBENCH + "\n```\n"
+                                   "TEST_PATTERNS:\n```json\n" + json_io.dumps(patterns).decode() + "\n```")
+        self.golden_response = "```python\n" + golden_code + "\n```"
+        self.delay = delay
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+        self.closed = False
+    
+    def is_available(self):
+        return True
+    
+    def generate(self, prompt, system_prompt=None, **kwargs):
+        self.prompts.append(system_prompt)
+        return self._respond(system_prompt)
+    
+    async def agenerate(self, prompt, system_prompt=None, **kwargs):
+        self.prompts.append(system_prompt)
+        self._enter()
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return self._respond(system_prompt)
+    
+    async def agenerate_stream(self, prompt, system_prompt=None, **kwargs):
+        self.prompts.append(system_prompt)
+        self._enter()
+        response = self._respond(system_prompt)
+        for start in range(0, len(response), 64):
+            await asyncio.sleep(self.delay / 4)
+            yield response[start:start + 64]
+        self.active -= 1
+    
+    def generate_candidates(self, prompt, system_prompt=None, n=2, **kwargs):
+        self.prompts.append(system_prompt)
+        response = self._respond(system_prompt)
+        return [response.replace("module tb;", f"module tb{index};") for index in range(n)]
+    
+    async def aclose(self):
+        self.closed = True
+    
+    def _enter(self):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+    
+    def _respond(self, system_prompt):
+        if "Python function" in system_prompt:
+            return self.golden_response
+        if "update a testbench" in system_prompt:
+            return "```verilog\n" + TESTBENCH + "\n```"
+        return self.testbench_response
 
 
 class TestPipeline(unittest.TestCase):
@@ -81,7 +162,114 @@ endmodule"""
         self.assertIn('testbench_initial.v', output_files)
         self.assertIn('golden_model.py', output_files)
         self.assertIn('testbench_final.v', output_files)
-
+    
+    def test_testbench_and_golden_model_requested_concurrently(self):
+        """Test that Steps 3 and 4 are in flight together and the async client is closed afterwards."""
+        patterns = [{'a': '0', 'b': '1'}, {'a': '1', 'b': '1'}]
+        fake = FakeLLMClient(patterns, "def and_gate_golden(a, b):\n    return {'y': a & b}", delay=0.05)
+        self._use_fake(self.pipeline, fake)
+        
+        result = self.pipeline.run("An AND gate.", VERILOG_AND, self.temp_dir)
+        
+        self.assertEqual(fake.max_active, 2)
+        self.assertTrue(fake.closed)
+        self.assertEqual([p['expected_outputs'] for p in result['test_patterns_with_outputs']], [{'y': 0}, {'y': 1}])
+        with open(os.path.join(self.temp_dir, 'testbench_initial.v')) as f:
+            self.assertEqual(f.read(), TESTBENCH)
+    
+    def test_failed_golden_step_leaves_no_pattern_file(self):
+        """Test that a failure while computing golden outputs removes the partial pattern file."""
+        patterns = [{'a': '0', 'b': '1'}]
+        self._use_fake(self.pipeline, FakeLLMClient(patterns, "def and_gate_golden(a, b):\n    return {'y': a & b}"))
+        
+        def fail(python_code, test_patterns, module_info, sink, **kwargs):
+            sink(dict(test_patterns[0], expected_outputs={'y': 0}))
+            raise KeyboardInterrupt
+        
+        with mock.patch.object(self.pipeline.golden_gen, 'compute_golden_outputs', side_effect=fail):
+            with self.assertRaises(KeyboardInterrupt):
+                self.pipeline.run("An AND gate.", VERILOG_AND, self.temp_dir)
+        
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'test_patterns_with_golden.json')))
+        self.assertTrue(self.pipeline.llm_client.closed)
+    
+    def test_first_compiling_candidate_is_kept(self):
+        """Test that of several sampled testbenches the first one iverilog accepts is kept."""
+        pipeline = TestbenchPipeline(n_candidates=3)
+        self._use_fake(pipeline, FakeLLMClient([{'a': '0', 'b': '1'}],
+                                               "def and_gate_golden(a, b):\n    return {'y': a & b}"))
+        
+        def compile_testbench(sources, output_path):
+            # Only the first candidate fails to compile
+            with open(sources[1]) as f:
+                returncode = 1 if "module tb0;" in f.read() else 0
+            return subprocess.CompletedProcess(sources, returncode, "", "")
+        
+        with mock.patch.object(simulator, 'compile_testbench', side_effect=compile_testbench):
+            result = pipeline.run("An AND gate.", VERILOG_AND, self.temp_dir)
+        
+        self.assertTrue(result['initial_testbench'].startswith("module tb1;"))
+    
+    def test_parallel_golden_pipeline(self):
+        """Test a pipeline run whose golden outputs are computed in worker processes."""
+        patterns = [{'a': format(a, 'b'), 'b': format(b, 'b')} for a in range(20) for b in range(20)]
+        # str() keeps the model out of the compiled batch path
+        golden_code = "def and_gate_golden(a, b):\n    return {'y': int(str(a)) & b}"
+        pipeline = TestbenchPipeline(parallel_golden=True)
+        self._use_fake(pipeline, FakeLLMClient(patterns, golden_code))
+        
+        result = pipeline.run("An AND gate.", VERILOG_AND, self.temp_dir)
+        
+        outputs = [p['expected_outputs'] for p in result['test_patterns_with_outputs']]
+        self.assertEqual(outputs, [{'y': a & b} for a in range(20) for b in range(20)])
+    
+    @unittest.skipIf(golden_runner.njit is None, "numba not installed")
+    def test_binary_string_patterns_use_batch_kernel(self):
+        """Test that Step 3's binary-string patterns reach the compiled golden kernel."""
+        patterns = [{'a': format(a, 'b'), 'b': format(b, 'b')} for a in range(20) for b in range(20)]
+        golden_code = "def and_gate_golden(a, b):\n    return {'y': a & b}"
+        self._use_fake(self.pipeline, FakeLLMClient(patterns, golden_code))
+        
+        batches = []
+        def run_batch(*args):
+            batches.append(golden_runner.run_batch(*args))
+            return batches[-1]
+        
+        with mock.patch.object(golden_model_generator, 'run_batch', side_effect=run_batch):
+            result = self.pipeline.run("An AND gate.", VERILOG_AND, self.temp_dir)
+        
+        outputs = [p['expected_outputs'] for p in result['test_patterns_with_outputs']]
+        self.assertEqual(outputs, [{'y': a & b} for a in range(20) for b in range(20)])
+        self.assertIsNotNone(batches[0])
+    
+    def _use_fake(self, pipeline, fake):
+        """Route every LLM request of a pipeline to a fake client."""
+        pipeline.llm_client = fake
+        for component in (pipeline.testbench_gen, pipeline.golden_gen, pipeline.testbench_updater):
+            component.llm_client = fake
+    
+    def test_pattern_file_layout(self):
+        """Test that streamed patterns are saved as the indented list json.dump writes."""
+        patterns = [
+            {'a': 0, 'b': 1, 'expected_outputs': {'y': 0}},
+            {'a': 1, 'b': 1, 'expected_outputs': {'y': 1}},
+            {'a': 1, 'b': 0, 'expected_outputs': None, 'error': 'boom'},
+        ]
+        
+        for chunk_rows in (_PatternWriter.CHUNK_ROWS, 1):
+            self.assertEqual(self._write_patterns(patterns, chunk_rows), json.dumps(patterns, indent=2))
+        self.assertEqual(self._write_patterns([]), '[]')
+    
+    def _write_patterns(self, patterns, chunk_rows=_PatternWriter.CHUNK_ROWS):
+        """Stream patterns through a pattern writer and return the file contents."""
+        path = os.path.join(self.temp_dir, 'patterns.json')
+        writer = _PatternWriter(path)
+        writer.CHUNK_ROWS = chunk_rows
+        for pattern in patterns:
+            writer.add(pattern)
+        writer.close()
+        with open(path) as f:
+            return f.read()
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,51 @@
+"""
+Test running the simulation tools
+"""
+
+import unittest
+import sys
+import os
+import shutil
+import time
+from unittest import mock
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import simulator
+
+
+@unittest.skipIf(shutil.which("echo") is None or shutil.which("sleep") is None, "coreutils not installed")
+class TestSimulator(unittest.TestCase):
+    """Test run_simulation with stand-in commands for vvp."""
+
+    def test_streams_output_lines(self):
+        """Test that each output line reaches the callback and the captured stdout."""
+        lines = []
+        with mock.patch.object(simulator, '_VVP', shutil.which("echo")):
+            result = simulator.run_simulation("PASS: 4/4", on_line=lines.append)
+
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(lines, ["PASS: 4/4\n"])
+        self.assertEqual(result.stdout, "PASS: 4/4\n")
+
+    def test_streaming_timeout_kills_simulation(self):
+        """Test that a hanging simulation is killed after the timeout."""
+        start = time.monotonic()
+        with mock.patch.object(simulator, '_VVP', shutil.which("sleep")):
+            result = simulator.run_simulation("30", timeout=0.2, on_line=lambda line: None)
+
+        self.assertNotEqual(result.returncode, 0)
+        self.assertLess(time.monotonic() - start, 10)
+
+    def test_missing_tool(self):
+        """Test that a missing vvp is reported as exit code 127 in both modes."""
+        with mock.patch.object(simulator, '_VVP', "/nonexistent/vvp"):
+            for on_line in (None, lambda line: None):
+                result = simulator.run_simulation("sim.vvp", on_line=on_line)
+                self.assertEqual(result.returncode, 127)
+                self.assertIn("command not found", result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
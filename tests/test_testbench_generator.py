@@ -0,0 +1,125 @@
+"""
+Test LLM request handling of the testbench generator
+"""
+
+import unittest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.testbench_generator import TestbenchGenerator, _SectionWatcher, _TESTBENCH_RE
+from src import json_io
+
+
+VERILOG_AND = """module and_gate (
+    input wire a,
+    input wire b,
+    output wire y
+);
+    assign y = a & b;
+endmodule"""
+
+
+class FakeLLMClient:
+    """Offline stand-in for LLMClient that returns queued responses and records the requests."""
+
+    def __init__(self, responses, json_mode=True):
+        self.responses = list(responses)
+        self.json_mode = json_mode
+        self.requests = []
+
+    def is_available(self):
+        return True
+
+    def supports_json_mode(self):
+        return self.json_mode
+
+    def generate(self, prompt, system_prompt=None, **kwargs):
+        self.requests.append(dict(kwargs, prompt=prompt))
+        return self.responses.pop(0)
+
+
+class TestTestbenchGenerator(unittest.TestCase):
+    """Test how the testbench generator builds requests and parses responses."""
+
+    def test_combined_response(self):
+        """Test that a combined response is split into testbench, patterns and golden model."""
+        payload = {
+            "testbench": "module tb;\nendmodule\n",
+            "test_patterns": [{"a": "0", "b": "1"}],
+            "golden_model": "def and_gate_golden(a, b):\n    return {'y': a & b}\n",
+        }
+        client = FakeLLMClient([json_io.dumps(payload).decode()])
+
+        result = TestbenchGenerator(client).generate_testbench_and_model("An AND gate.", VERILOG_AND)
+
+        self.assertEqual(client.requests[0]['response_format'], {"type": "json_object"})
+        self.assertEqual(result['testbench_code'], "module tb;\nendmodule")
+        self.assertEqual(result['test_patterns'], [{"a": "0", "b": "1"}])
+        self.assertTrue(result['python_code'].startswith("def and_gate_golden(a, b):"))
+        self.assertEqual(result['module_info']['module_name'], 'and_gate')
+
+    def test_combined_response_without_json_mode(self):
+        """Test that models without JSON mode get no response_format and may fence the JSON."""
+        payload = {"testbench": "module tb;\nendmodule", "golden_model": "def f(): pass"}
+        client = FakeLLMClient(["Here it is:\n```json\n" + json_io.dumps(payload).decode() + "\n```"],
+                               json_mode=False)
+
+        result = TestbenchGenerator(client).generate_testbench_and_model("An AND gate.", VERILOG_AND)
+
+        self.assertIsNone(client.requests[0]['response_format'])
+        self.assertEqual(result['testbench_code'], "module tb;\nendmodule")
+        self.assertEqual(result['test_patterns'], [])
+
+    def test_unparsable_combined_response(self):
+        """Test that an unusable combined response yields None so the caller can fall back."""
+        client = FakeLLMClient(["Error: model does not support JSON mode"])
+
+        self.assertIsNone(TestbenchGenerator(client).generate_testbench_and_model("An AND gate.", VERILOG_AND))
+
+    def test_batch_halves_incomplete_response(self):
+        """Test that modules missing from a batched response are retried in smaller batches."""
+        def batched(indices):
+            return "\n".join(f"TESTBENCH_CODE[{i}]:\n```verilog\nmodule tb{i};\nendmodule\n```\n"
+                             f"TEST_PATTERNS[{i}]:\n```json\n[{{\"a\": {i}}}]\n```" for i in indices)
+        single = "TESTBENCH_CODE:\n```verilog\nmodule tb;\nendmodule\n```\nTEST_PATTERNS:\n```json\n[]\n```"
+        # Three modules, of which only [0] comes back; then [0] alone and [1, 2] together
+        client = FakeLLMClient([batched([0]), single, batched([0, 1])])
+
+        results = TestbenchGenerator(client).generate_testbench_batch([("An AND gate.", VERILOG_AND)] * 3)
+
+        self.assertEqual(len(client.requests), 3)
+        self.assertEqual([r['testbench_code'] for r in results], ["module tb;\nendmodule", "module tb0;\nendmodule",
+                                                                 "module tb1;\nendmodule"])
+        self.assertEqual(results[2]['test_patterns'], [{"a": 1}])
+
+    def test_batch_does_not_split_failed_request(self):
+        """Test that an API error is returned for every module instead of being retried in halves."""
+        client = FakeLLMClient(["Error: rate limited"])
+
+        results = TestbenchGenerator(client).generate_testbench_batch([("An AND gate.", VERILOG_AND)] * 4)
+
+        self.assertEqual(len(client.requests), 1)
+        self.assertEqual([r['raw_response'] for r in results], ["Error: rate limited"] * 4)
+
+    def test_section_watcher_reports_testbench_mid_stream(self):
+        """Test that the testbench is reported once, as soon as its closing fence arrives."""
+        response = ("TESTBENCH_CODE:\n```verilog\nmodule tb;\nendmodule\n```\n"
+                    "TEST_PATTERNS:\n```json\n[{\"a\": 0}]\n```")
+        fence_end = response.index("```\nTEST_PATTERNS") + 3
+        # Split the closing fence across two chunks
+        chunks = [response[:fence_end - 1], response[fence_end - 1:fence_end], response[fence_end:]]
+        reported = []
+        watcher = _SectionWatcher(_TESTBENCH_RE, lambda code: reported.append((code, len(watcher.parts))))
+
+        for chunk in chunks:
+            watcher.feed(chunk)
+
+        self.assertEqual(reported, [("module tb;\nendmodule", 2)])
+        self.assertEqual(watcher.text(), response)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Test golden model derivation from continuous-assignment Verilog
+"""
+
+import unittest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.verilog_model import synthesize_golden_model
+
+
+def _load(python_code, function_name):
+    """Execute generated code and return the golden function."""
+    namespace = {}
+    exec(python_code, namespace)
+    return namespace[function_name]
+
+
+class TestVerilogModel(unittest.TestCase):
+    """Test Verilog-to-Python golden model translation."""
+
+    def test_mux(self):
+        """Test translation of a conditional assignment."""
+        verilog_code = """module mux2to1 (
+    input wire a,
+    input wire b,
+    input wire sel,
+    output wire y
+);
+    assign y = sel ? b : a;
+endmodule"""
+
+        golden = _load(synthesize_golden_model(verilog_code, 'mux2to1'), 'mux2to1_golden')
+
+        for a in (0, 1):
+            for b in (0, 1):
+                self.assertEqual(golden(a=a, b=b, sel=0), {'y': a})
+                self.assertEqual(golden(a=a, b=b, sel=1), {'y': b})
+
+    def test_adder_with_intermediate_wire(self):
+        """Test width truncation, part selects and assignment ordering."""
+        verilog_code = """module adder4bit (
+    input wire [3:0] a,
+    input wire [3:0] b,
+    output wire [3:0] sum,
+    output wire carry
+);
+    assign sum = result[3:0];
+    assign carry = result[4];
+    wire [4:0] result;
+    assign result = a + b;
+endmodule"""
+
+        golden = _load(synthesize_golden_model(verilog_code, 'adder4bit'), 'adder4bit_golden')
+
+        for a in range(16):
+            for b in range(16):
+                self.assertEqual(golden(a=a, b=b), {'sum': (a + b) & 0xF, 'carry': (a + b) >> 4})
+
+    def test_invert_and_concat(self):
+        """Test bitwise inversion at the target width and concatenation."""
+        verilog_code = """module swap (
+    input wire [3:0] x,
+    output wire [3:0] n,
+    output wire [7:0] c
+);
+    assign n = ~x;
+    assign c = {x, 4'b1010};
+endmodule"""
+
+        golden = _load(synthesize_golden_model(verilog_code, 'swap'), 'swap_golden')
+
+        self.assertEqual(golden(x=0b0011), {'n': 0b1100, 'c': 0b00111010})
+
+    def test_binary_string_inputs(self):
+        """Test that binary-string pattern values are parsed before computing."""
+        verilog_code = """module mux2to1 (
+    input wire a,
+    input wire b,
+    input wire sel,
+    output wire y
+);
+    assign y = sel ? b : a;
+endmodule"""
+
+        golden = _load(synthesize_golden_model(verilog_code, 'mux2to1'), 'mux2to1_golden')
+
+        self.assertEqual(golden(a='1', b='0', sel='0'), {'y': 1})
+        self.assertEqual(golden(a='1', b='0', sel='1'), {'y': 0})
+
+        verilog_code = """module adder4bit (
+    input wire [3:0] a,
+    input wire [3:0] b,
+    output wire [3:0] sum,
+    output wire carry
+);
+    wire [4:0] result;
+    assign result = a + b;
+    assign sum = result[3:0];
+    assign carry = result[4];
+endmodule"""
+
+        golden = _load(synthesize_golden_model(verilog_code, 'adder4bit'), 'adder4bit_golden')
+
+        self.assertEqual(golden(a='1111', b='0010'), {'sum': 0b0001, 'carry': 1})
+
+    def test_rejects_procedural_logic(self):
+        """Test that modules with always blocks are not translated."""
+        verilog_code = """module dff (
+    input wire clk,
+    input wire d,
+    output reg q
+);
+    always @(posedge clk) q <= d;
+endmodule"""
+
+        self.assertIsNone(synthesize_golden_model(verilog_code, 'dff'))
+
+    def test_rejects_module_name_mismatch(self):
+        """Test that the generated function name must match the module."""
+        verilog_code = "module inv(input wire a, output wire y); assign y = ~a; endmodule"
+
+        self.assertIsNone(synthesize_golden_model(verilog_code, 'unknown'))
+
+
+if __name__ == '__main__':
+    unittest.main()